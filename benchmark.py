@@ -0,0 +1,251 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# GIAnT Group Interaction Analysis Toolkit
+# Copyright (C) 2017 Interactive Media Lab Dresden
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# Measures how GIAnT scales with the session size: Generates synthetic sessions (see generate_session.py) for
+# every combination of the given numbers of users and durations, and times the csv import, Session.load_from_db,
+# the User queries and the data queries each panel runs per update. The results are written as json, so runs of
+# different versions can be compared.
+# The User implementation is selected by GIANT_BACKEND (see pat_model). Rendering needs a display and isn't
+# measured here; press P in GIAnT to print the update times of the panels.
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+
+import numpy as np
+
+import generate_session
+import pat_model
+import setup
+
+if pat_model.BACKEND == "plots":
+    from libavg import player
+    player.loadPlugin("plots")
+
+PANEL_WIDTH = 900                   # Typical data area width of the panels in pixels
+WALL_HEAT_MAP_PARAMS = ((pat_model.x_wall_range[0], pat_model.y_wall_range[0]),
+        (pat_model.x_wall_range[1], pat_model.y_wall_range[1]), (50, 25))
+FLOOR_HEAT_MAP_PARAMS = ((pat_model.pos_range[0][0], -0.5), (pat_model.pos_range[1][0], 2.5), (50, 25))
+
+
+def get_stats(durations):
+    """
+    :param durations: list of measured times in seconds
+    """
+    durations = np.array(durations)
+    return {
+        "count": len(durations),
+        "total": float(durations.sum()),
+        "mean": float(durations.mean()),
+        "median": float(np.median(durations)),
+        "min": float(durations.min()),
+        "max": float(durations.max())
+    }
+
+
+def time_once(func, *args):
+    """
+    :return: Result of func and get_stats() of its run time.
+    """
+    start_time = time.time()
+    result = func(*args)
+    return result, get_stats([time.time() - start_time])
+
+
+def time_calls(func, args_list):
+    durations = []
+    for args in args_list:
+        start_time = time.time()
+        func(*args)
+        durations.append(time.time() - start_time)
+    return get_stats(durations)
+
+
+def import_session(session):
+    setup.create_tables(True)
+    con = pat_model.get_connection()
+    fingerprints = setup.get_changed_fingerprints(con, session)
+    setup.write_session(con, session, fingerprints, setup.resample_optitrack(session), setup.read_touches(session))
+    setup.create_indexes(con)
+
+
+def get_random_intervals(rng, duration, num_intervals):
+    """
+    :return: (start, end) time intervals between 10 seconds and the whole session long, uniformly distributed on
+        a log scale.
+    """
+    lengths = np.exp(rng.uniform(np.log(10), np.log(duration), num_intervals))
+    starts = rng.uniform(0, duration - lengths)
+    return [(float(start), float(start + length)) for start, length in zip(starts, lengths)]
+
+
+def get_user_queries(smoothness):
+    """
+    :return: dict of query name: function(user, start_time, end_time)
+    """
+    time_step = lambda start, end: (end - start) / PANEL_WIDTH
+    return {
+        "getHeadPos": lambda user, start, end: user.getHeadPos(start),
+        "getWallViewpoint": lambda user, start, end: user.getWallViewpoint(start),
+        "getHeadPosAvg": lambda user, start, end: user.getHeadPosAvg(start, smoothness),
+        "getHeadPosAvgs": lambda user, start, end: user.getHeadPosAvgs(start, time_step(start, end), PANEL_WIDTH,
+                smoothness),
+        "getHeadPosExtents": lambda user, start, end: user.getHeadPosExtents(start, end, PANEL_WIDTH),
+        "getDistTravelled": lambda user, start, end: user.getDistTravelled(start, end),
+        "getDistTravelled (simplified)": lambda user, start, end: user.getDistTravelled(start, end, 0.05),
+        "getAvgDistFromWall": lambda user, start, end: user.getAvgDistFromWall(start, end),
+        "getHeadXZPosns": lambda user, start, end: user.getHeadXZPosns(start, end),
+        "getHeadViewpoints": lambda user, start, end: user.getHeadViewpoints(start, end),
+        "getHeadXZPosHeatMap": lambda user, start, end: user.getHeadXZPosHeatMap(start, end,
+                *FLOOR_HEAT_MAP_PARAMS),
+        "getHeadViewpointHeatMap": lambda user, start, end: user.getHeadViewpointHeatMap(start, end,
+                *WALL_HEAT_MAP_PARAMS),
+        "countTouches": lambda user, start, end: user.countTouches(start, end),
+        "getTouches": lambda user, start, end: user.getTouches(start, end),
+        "getTouchArrays": lambda user, start, end: user.getTouchArrays(start, end),
+    }
+
+
+# Data queries of the panels' update handlers for a time interval change, without the node updates.
+
+def update_movement_panel(users, start, end, smoothness):
+    time_step = (end - start) / PANEL_WIDTH
+    for user in users:
+        pat_model.get_head_pos_avgs(user, start, time_step, PANEL_WIDTH, smoothness)
+        pat_model.get_touch_arrays(user, start, end)
+
+
+def update_wall_panel(users, start, end, smoothness):
+    for user in users:
+        user.getTouchIndexRange(start, end)
+        pat_model.get_head_viewpoint_heat_map(user, start, end, *WALL_HEAT_MAP_PARAMS)
+
+
+def update_floor_panel(users, start, end, smoothness):
+    for user in users:
+        pat_model.get_head_xz_pos_heat_map(user, start, end, *FLOOR_HEAT_MAP_PARAMS)
+        user.getHeadPos(end)
+        user.getWallViewpoint(end)
+
+
+def update_stats_panel(users, start, end, smoothness):
+    for user in users:
+        user.getDistTravelled(start, end)
+        user.getAvgDistFromWall(start, end)
+        user.countTouches(start, end)
+
+
+PANEL_UPDATES = {
+    "movement": update_movement_panel,
+    "wall": update_wall_panel,
+    "floor": update_floor_panel,
+    "stats": update_stats_panel,
+}
+
+
+def run_benchmark(params, work_dir, num_intervals):
+    """
+    Generates, imports and loads one session and runs the queries.
+    :return: dict with the session parameters, sizes and timings
+    """
+    data_dir = os.path.join(work_dir, "data")
+    pat_model.DB_FILENAME = os.path.join(work_dir, "db")
+    pat_model.db = pat_model.Database(pat_model.DB_FILENAME)
+    timings = {}
+
+    _, timings["generate"] = time_once(generate_session.generate_session, params, data_dir)
+    session = generate_session.create_session(params, data_dir)
+    _, timings["import"] = time_once(import_session, session)
+    _, timings["load_from_db (no cache)"] = time_once(session.load_from_db, False)
+    _, timings["load_from_db (write cache)"] = time_once(session.load_from_db)
+    _, timings["load_from_db (cached)"] = time_once(session.load_from_db)
+    pat_model.db.close()
+
+    users = session.users
+    rng = np.random.RandomState(params.seed)
+    intervals = get_random_intervals(rng, session.duration, num_intervals)
+    smoothness = 10
+    for name, query in sorted(get_user_queries(smoothness).items()):
+        timings["User." + name] = time_calls(query,
+                [(user, start, end) for user in users for start, end in intervals])
+    for name, update in sorted(PANEL_UPDATES.items()):
+        timings["panel." + name] = time_calls(update, [(users, start, end, smoothness) for start, end in intervals])
+
+    return {
+        "params": vars(params),
+        "num_head_samples": sum(len(user.getHeadXZPosns(-1, session.duration+1)) for user in users),
+        "num_touches": sum(user.countTouches(-1, session.duration+1) for user in users),
+        "duration": session.duration,
+        "timings": timings
+    }
+
+
+def get_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"],
+                cwd=os.path.dirname(os.path.abspath(__file__))).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks GIAnT with synthetic sessions of different sizes.")
+    parser.add_argument("--users", type=int, nargs="+", default=[4, 8], help="Numbers of users.")
+    parser.add_argument("--durations", type=float, nargs="+", default=[10, 60, 180],
+            help="Session lengths in minutes.")
+    parser.add_argument("--rate", type=float, default=60., help="Optitrack samples per second and user.")
+    parser.add_argument("--touches", type=float, default=10., help="Touches per user and minute.")
+    parser.add_argument("--intervals", type=int, default=100, help="Number of random time intervals queried.")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed.")
+    parser.add_argument("--work-dir", help="Directory for the generated files (default: temporary directory, "
+            "deleted afterwards).")
+    parser.add_argument("-o", "--output", default="benchmark.json", help="Result file.")
+    args = parser.parse_args()
+
+    results = {
+        "commit": get_commit(),
+        "backend": pat_model.BACKEND,
+        "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "runs": []
+    }
+    for num_users, duration in itertools.product(args.users, args.durations):
+        print "---- {} users, {} minutes ----".format(num_users, duration)
+        params = generate_session.SessionParams(num_users=num_users, duration=duration*60, rate=args.rate,
+                touches_per_min=args.touches, seed=args.seed)
+        if args.work_dir is None:
+            work_dir = tempfile.mkdtemp(prefix="giant_benchmark")
+        else:
+            work_dir = os.path.join(args.work_dir, "u{}_d{}".format(num_users, duration))
+            if not os.path.exists(work_dir):
+                os.makedirs(work_dir)
+        try:
+            results["runs"].append(run_benchmark(params, work_dir, args.intervals))
+        finally:
+            if args.work_dir is None:
+                shutil.rmtree(work_dir)
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    print "Results written to", args.output
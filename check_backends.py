@@ -0,0 +1,275 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# GIAnT Group Interaction Analysis Toolkit
+# Copyright (C) 2017 Interactive Media Lab Dresden
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# Checks numpy_plots on synthetic head and touch data. The invariants (sizes and types of the results, behaviour
+# at the session and interval edges, returned arrays are copies) only need numpy. If libavg and the plots plugin
+# are available, the User queries are also run for random time intervals with both implementations and every
+# query whose results differ is reported.
+
+import argparse
+import sys
+
+import numpy as np
+
+import numpy_plots
+
+START_TIME = 1.45e9
+DURATION = 600.
+WALL_HEAT_MAP_PARAMS = ((0, 0.4), (4.9, 2.46), (50, 25))
+FLOOR_HEAT_MAP_PARAMS = ((-0.5, -0.5), (5.5, 2.5), (50, 25))
+
+
+def create_user_data(rng, num_samples, num_touches):
+    # Head data at about 30 fps with some dropped frames; positions are a random walk.
+    time_steps = np.full(num_samples, 1/30.)
+    time_steps[rng.rand(num_samples) < 0.01] *= 5
+    times = START_TIME + np.cumsum(time_steps)
+    posns = (np.cumsum(rng.randn(num_samples, 3) * 0.01, axis=0) + (2, 1, 1)).astype(np.float32)
+    rots = (rng.randn(num_samples, 3) * 0.3).astype(np.float32)
+    pos_prefix_sums = np.cumsum(posns, axis=0).astype(np.float32)
+    viewpts = (rng.rand(num_samples, 2) * (5, 3)).astype(np.float32)
+
+    touch_times = (rng.rand(num_touches) * DURATION).astype(np.float32)
+    touch_posns = (rng.rand(num_touches, 2) * (4*1920, 3*1080)).astype(np.float32)
+    touch_durations = rng.rand(num_touches).astype(np.float32)
+    return (times, posns, rots, pos_prefix_sums, viewpts), (touch_times, touch_posns, touch_durations)
+
+
+def load_plugin():
+    """
+    :return: The plots plugin, or None if libavg or the plugin aren't available.
+    """
+    try:
+        from libavg import player
+        player.loadPlugin("plots")
+    except Exception as e:    # ImportError without libavg, libavg.Exception if the plugin isn't built.
+        print "plots plugin not available ({}), only checking the invariants.".format(e)
+        return None
+    return plots
+
+
+def create_user(module, head_data, touch_data):
+    user = module.User(0, START_TIME, DURATION)
+    user.setHeadData(*head_data)
+    user.setTouches(*touch_data)
+    return user
+
+
+def to_array(result):
+    """
+    Converts the result of a query to a float array, so the results of both backends can be compared.
+    """
+    if isinstance(result, str):
+        return np.frombuffer(result, dtype=np.float32)
+    elif isinstance(result, tuple) and all(isinstance(item, str) for item in result):
+        return np.concatenate([np.frombuffer(item, dtype=np.float32) for item in result])
+    elif isinstance(result, list) and len(result) > 0 and hasattr(result[0], "duration"):
+        return np.array([(touch.time, touch.duration, touch.pos[0], touch.pos[1]) for touch in result])
+    elif isinstance(result, list) or (isinstance(result, np.ndarray) and result.ndim == 2):
+        return np.array([tuple(pt) for pt in result], dtype=np.float32).reshape(-1)
+    else:
+        return np.array(tuple(result) if hasattr(result, "__len__") else (result,), dtype=np.float64)
+
+
+def get_queries(rng, num_intervals):
+    """
+    :return: list of (description, function that runs the query on a user)
+    """
+    queries = []
+    for _ in range(num_intervals):
+        start = float(rng.rand() * (DURATION+40) - 20)
+        end = start + float(rng.rand() * DURATION/2)
+        num_buckets = int(rng.randint(1, 40))
+        smoothness = int(rng.randint(1, 60))
+        time_step = (end - start) / num_buckets
+        # Default arguments bind the current values.
+        queries += [
+            ("getHeadPos({})".format(start), lambda u, s=start: u.getHeadPos(s)),
+            ("getWallViewpoint({})".format(start), lambda u, s=start: u.getWallViewpoint(s)),
+            ("getHeadRot({})".format(start), lambda u, s=start: u.getHeadRot(s)),
+            ("getHeadPosns({}, {}, {})".format(start, time_step, num_buckets),
+                    lambda u, s=start, ts=time_step, n=num_buckets: u.getHeadPosns(s, ts, n)),
+            ("getHeadPosns({}, {}, {})".format(end, -time_step, num_buckets),
+                    lambda u, e=end, ts=time_step, n=num_buckets: u.getHeadPosns(e, -ts, n)),
+            ("getHeadPosAvg({}, {})".format(end, smoothness),
+                    lambda u, e=end, sm=smoothness: u.getHeadPosAvg(e, sm)),
+            ("getHeadPosAvgs({}, {}, {}, {})".format(start, time_step, num_buckets, smoothness),
+                    lambda u, s=start, ts=time_step, n=num_buckets, sm=smoothness: u.getHeadPosAvgs(s, ts, n, sm)),
+            ("getHeadPosAvgs({}, {}, {}, {})".format(end, -time_step, num_buckets, smoothness),
+                    lambda u, e=end, ts=time_step, n=num_buckets, sm=smoothness: u.getHeadPosAvgs(e, -ts, n, sm)),
+            ("getHeadPosExtents({}, {}, {})".format(start, end, num_buckets),
+                    lambda u, s=start, e=end, n=num_buckets: u.getHeadPosExtents(s, e, n)),
+            ("getHeadPosExtents({}, {}, {})".format(end, start, num_buckets),
+                    lambda u, s=start, e=end, n=num_buckets: u.getHeadPosExtents(e, s, n)),
+            ("getDistTravelled({}, {})".format(start, end), lambda u, s=start, e=end: u.getDistTravelled(s, e)),
+            ("getDistTravelled({}, {}, 0.05)".format(start, end),
+                    lambda u, s=start, e=end: u.getDistTravelled(s, e, 0.05)),
+            ("getAvgDistFromWall({}, {})".format(start, end),
+                    lambda u, s=start, e=end: u.getAvgDistFromWall(s, e)),
+            ("getHeadXZPosns({}, {})".format(start, end), lambda u, s=start, e=end: u.getHeadXZPosns(s, e)),
+            ("getHeadViewpoints({}, {})".format(start, end), lambda u, s=start, e=end: u.getHeadViewpoints(s, e)),
+            ("getHeadXZPosHeatMap({}, {})".format(start, end),
+                    lambda u, s=start, e=end: u.getHeadXZPosHeatMap(s, e, *FLOOR_HEAT_MAP_PARAMS)),
+            ("getHeadViewpointHeatMap({}, {})".format(start, end),
+                    lambda u, s=start, e=end: u.getHeadViewpointHeatMap(s, e, *WALL_HEAT_MAP_PARAMS)),
+            ("countTouches({}, {})".format(start, end), lambda u, s=start, e=end: u.countTouches(s, e)),
+            ("getTouches({}, {})".format(start, end), lambda u, s=start, e=end: u.getTouches(s, e)),
+            ("getTouchArrays({}, {})".format(start, end), lambda u, s=start, e=end: u.getTouchArrays(s, e)),
+            ("getTouchIndexRange({}, {})".format(start, end),
+                    lambda u, s=start, e=end: u.getTouchIndexRange(s, e)),
+        ]
+    return queries
+
+
+def check_invariants(seed, num_samples, num_touches):
+    rng = np.random.RandomState(seed)
+    head_data, touch_data = create_user_data(rng, num_samples, num_touches)
+    user = create_user(numpy_plots, head_data, touch_data)
+    times, posns = head_data[0] - START_TIME, head_data[1]
+    # Time arguments are rounded to float32, so the checks use times between samples and after the last sample.
+    end_time = float(times[-1]) + 1
+    mid_index = len(times) // 2
+    mid_time = float(times[mid_index] + times[mid_index+1]) / 2
+    failed = []
+
+    def check(description, condition):
+        if not condition:
+            failed.append(description)
+            print "Failed: {}".format(description)
+
+    def floats(result, num_components):
+        check("float32 string result", isinstance(result, str) and len(result) % (4*num_components) == 0)
+        return np.frombuffer(result, dtype=np.float32).reshape(-1, num_components)
+
+    # Point queries clamp to the first and last sample.
+    check("getHeadPos before the session", user.getHeadPos(-10) == tuple(posns[0]))
+    check("getHeadPos between samples", user.getHeadPos(mid_time) == tuple(posns[mid_index]))
+    check("getHeadPos after the session", user.getHeadPos(end_time) == tuple(posns[-1]))
+
+    # getHeadPosns samples getHeadPos, including before and after the session.
+    sample_times = np.float32(-5) + np.arange(100, dtype=np.float32) * np.float32((end_time+10) / 99)
+    head_posns = floats(user.getHeadPosns(-5, (end_time+10) / 99, 100), 3)
+    check("getHeadPosns size", head_posns.shape == (100, 3))
+    check("getHeadPosns matches getHeadPos",
+            all(tuple(pos) == user.getHeadPos(float(t)) for pos, t in zip(head_posns, sample_times)))
+    check("getHeadPosns without samples", user.getHeadPosns(0, 1, 0) == "")
+
+    # getHeadPosAvg(time, 1) isn't getHeadPos(time): The average covers the sample after time and is 0 at the last
+    # sample. The floor trail uses getHeadPosns for this reason.
+    check("getHeadPosAvg(time, 1) is the next sample",
+            np.allclose(user.getHeadPosAvg(mid_time, 1), posns[mid_index+1], atol=0.01))
+    check("getHeadPosAvg(time, 1) at the last sample", user.getHeadPosAvg(end_time, 1) == (0, 0, 0))
+
+    check("getHeadPosAvgs size", floats(user.getHeadPosAvgs(0, 1, 30, 10), 3).shape == (30, 3))
+    mins, maxs = [floats(result, 3) for result in user.getHeadPosExtents(-20, end_time + 20, 50)]
+    check("getHeadPosExtents size", mins.shape == maxs.shape == (50, 3))
+    check("getHeadPosExtents order", (mins <= maxs).all())
+    check("getHeadPosExtents before the session", (mins[0] == posns[0]).all() and (maxs[0] == posns[0]).all())
+    # Buckets of reversed intervals are empty and contain the position at the bucket start.
+    mins, maxs = [floats(result, 3) for result in user.getHeadPosExtents(100, 50, 10)]
+    bucket_starts = np.float32(100) + np.arange(10, dtype=np.float32) * ((np.float32(50)-np.float32(100)) / 10)
+    check("getHeadPosExtents of reversed interval", (mins == maxs).all() and
+            all(tuple(pos) == user.getHeadPos(float(t)) for pos, t in zip(mins, bucket_starts)))
+
+    # Intervals: Samples in (start, end]; intervals outside of the session or without samples are empty.
+    check("getHeadXZPosns of the session", (user.getHeadXZPosns(-1, end_time) == posns[:, 0::2]).all())
+    for start, end in ((-20, -10), (end_time, end_time + 10), (mid_time, mid_time), (100, 50)):
+        interval = "[{}, {}]".format(start, end)
+        check("getHeadXZPosns of empty interval " + interval, user.getHeadXZPosns(start, end).shape == (0, 2))
+        check("getHeadViewpoints of empty interval " + interval, user.getHeadViewpoints(start, end).shape == (0, 2))
+        check("getDistTravelled of empty interval " + interval, user.getDistTravelled(start, end) == 0)
+        check("getAvgDistFromWall of empty interval " + interval, user.getAvgDistFromWall(start, end) == 0)
+        heat_map = floats(user.getHeadXZPosHeatMap(start, end, *FLOOR_HEAT_MAP_PARAMS), 1)
+        check("getHeadXZPosHeatMap of empty interval " + interval, heat_map.shape == (50*25, 1) and
+                not heat_map.any())
+    heat_map = floats(user.getHeadViewpointHeatMap(-1, end_time, *WALL_HEAT_MAP_PARAMS), 1)
+    check("getHeadViewpointHeatMap of the session", heat_map.shape == (50*25, 1) and
+            0 < heat_map.sum() <= len(times))
+
+    # Touch intervals include both ends.
+    touch_times = np.sort(touch_data[0])
+    check("getTouchIndexRange of the session", user.getTouchIndexRange(-1, DURATION + 1) == (0, num_touches))
+    check("getTouchIndexRange before the session", user.getTouchIndexRange(-20, -10) == (0, 0))
+    check("getTouchIndexRange after the session",
+            user.getTouchIndexRange(DURATION + 10, DURATION + 20) == (num_touches, num_touches))
+    check("getTouchIndexRange of reversed interval", user.countTouches(DURATION, 0) == 0)
+    check("countTouches at a touch", user.countTouches(float(touch_times[5]), float(touch_times[5])) >= 1)
+    touch_arrays = user.getTouchArrays(-1, DURATION + 1)
+    check("getTouchArrays sizes", [len(array) for array in touch_arrays] ==
+            [4*num_touches, 8*num_touches, 4*num_touches])
+    check("getTouchArrays order", (np.frombuffer(touch_arrays[0], dtype=np.float32) == touch_times).all())
+
+    # Returned arrays are copies.
+    for name in ("getHeadXZPosns", "getHeadViewpoints", "getTouchPosns"):
+        query = getattr(user, name)
+        query(-1, end_time)[:] = -1
+        check(name + " returns a copy", (query(-1, end_time) != -1).any())
+
+    path = np.cumsum(rng.randn(num_samples, 2) * 0.01, axis=0).astype(np.float32)
+    for mode, tolerance in (("rdp", 0.01), ("vw", 0.0001)):
+        indexes = np.frombuffer(numpy_plots.simplifyPath(path, tolerance, mode), dtype=np.int32)
+        check("simplifyPath({}) keeps the ends".format(mode), indexes[0] == 0 and indexes[-1] == num_samples-1)
+        check("simplifyPath({}) order".format(mode), (np.diff(indexes) > 0).all())
+
+    print "{} invariants failed.".format(len(failed))
+    return not failed
+
+
+def check_backends(native_plots, seed, num_samples, num_touches, num_intervals, rel_tolerance):
+    rng = np.random.RandomState(seed)
+    head_data, touch_data = create_user_data(rng, num_samples, num_touches)
+    native_user = create_user(native_plots, head_data, touch_data)
+    numpy_user = create_user(numpy_plots, head_data, touch_data)
+
+    num_failed = 0
+    queries = get_queries(rng, num_intervals)
+    for description, query in queries:
+        native_result = to_array(query(native_user))
+        numpy_result = to_array(query(numpy_user))
+        if (native_result.shape != numpy_result.shape or
+                not np.allclose(native_result, numpy_result, rtol=rel_tolerance, atol=0)):
+            num_failed += 1
+            print "Mismatch: {}\n    plots: {}\n    numpy: {}".format(description, native_result, numpy_result)
+
+    path = np.cumsum(rng.randn(num_samples, 2) * 0.01, axis=0).astype(np.float32)
+    for mode, tolerance in (("rdp", 0.01), ("vw", 0.0001)):
+        native_indexes = native_plots.simplifyPath(path, tolerance, mode)
+        numpy_indexes = numpy_plots.simplifyPath(path, tolerance, mode)
+        if native_indexes != numpy_indexes:
+            num_failed += 1
+            print "Mismatch: simplifyPath({})".format(mode)
+
+    print "{} of {} queries differ.".format(num_failed, len(queries) + 2)
+    return num_failed == 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Checks numpy_plots and compares its results to the plots plugin "
+            "if it is available.")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed for the data and the queries.")
+    parser.add_argument("--samples", type=int, default=20000, help="Number of head data samples.")
+    parser.add_argument("--touches", type=int, default=500, help="Number of touches.")
+    parser.add_argument("--intervals", type=int, default=200, help="Number of random time intervals queried.")
+    parser.add_argument("--tolerance", type=float, default=0,
+            help="Relative tolerance for float results (default: results must be identical).")
+    args = parser.parse_args()
+    ok = check_invariants(args.seed, args.samples, args.touches)
+    native_plots = load_plugin()
+    if native_plots is not None:
+        ok = check_backends(native_plots, args.seed, args.samples, args.touches, args.intervals, args.tolerance) and ok
+    if not ok:
+        sys.exit(1)
@@ -27,61 +27,78 @@ from libavg import avg
 
 class FloorPanel(vis_panel.VisPanel):
 
-    def __init__(self, session, vis_params, parent, **kwargs):
+    TRAIL_SAMPLE_INTERVAL = 1/30.   # seconds between the points of the user trails
+
+    def __init__(self, session, vis_params, parent, trail_duration=0, **kwargs):
+        """
+        :param trail_duration: If > 0, the path of each user during the last trail_duration seconds before the
+            highlight time is shown.
+        """
         pos_range = pat_model.pos_range
         view_extent = avg.Point2D(pos_range[1][0] - pos_range[0][0], 3.0)
         aspect = view_extent.y/view_extent.x
         super(FloorPanel, self).__init__("Floor", vis_params, (60, 25), True, aspect, parent=parent, **kwargs)
 
         self.__users = session.users
+        self.__trail_duration = trail_duration
 
         self._create_x_axis(data_range=(pos_range[0][0], pos_range[1][0]), unit="m", top_axis=True)
         self._create_y_axis(data_range=(-0.5,2.5), tick_positions=[0,1,2], unit="m", hide_rims=True)
         self.__create_wall_rect()
 
         self._create_data_div()
-        self.__user_nodes = []
 
         self.__heatmap_nodes = []
+        self.__heatmap_range = ((pos_range[0][0], -0.5), (pos_range[1][0], 2.5))
+        self.__heatmap_size = (50,25)
         for user in self.__users:
             color = str(vis_params.get_user_color(user.getUserID()))
 
             node = heatmap.HeatMapNode(size=self._data_div.size,
-                    viewportrangemin=(pos_range[0][0], -0.5),
-                    viewportrangemax=(pos_range[1][0], 2.5),
-                    mapsize=(50,25), valuerangemin=0, valuerangemax=6,
+                    viewportrangemin=self.__heatmap_range[0], viewportrangemax=self.__heatmap_range[1],
+                    mapsize=self.__heatmap_size, valuerangemin=0, valuerangemax=6,
                     colormap=(color, color), opacitymap=(0,1), blendmode="add", parent=self._data_div)
             node.setEffect(avg.BlurFXNode(radius=1.2))
             self.__heatmap_nodes.append(node)
 
-        self.__time_interval = [None, None]
+        self.__user_nodes = [UserNode(user.getUserID(), show_trail=trail_duration > 0, parent=self._data_div)
+                for user in self.__users]
+
+        vis_params.subscribe(vis_params.HIGHLIGHT_TIME_CHANGED, self.__update_highlight_time)
+        vis_params.subscribe(vis_params.USER_VISIBILITY_CHANGED, self._update_time)
 
+    @helper.profiled
     def _update_time(self, vis_params):
+        self.__show_user_heatmap(vis_params.get_time_interval())
+
+    @helper.profiled
+    def __update_highlight_time(self, vis_params):
         self.__show_users(vis_params.highlight_time)
-        old_interval = self.__time_interval[:]
-        self.__time_interval = vis_params.get_time_interval()[:]
-        if old_interval != self.__time_interval:
-            self.__show_user_heatmap(vis_params.get_time_interval())
 
     def __show_users(self, time):
-        helper.unlink_node_list(self.__user_nodes)
-        self.__user_nodes = []
-
-        for i, user in enumerate(self.__users):
+        for user, node in zip(self.__users, self.__user_nodes):
+            if self.__trail_duration > 0:
+                # One batched query for the whole trail, ending at time.
+                num_samples = int(self.__trail_duration / self.TRAIL_SAMPLE_INTERVAL) + 1
+                trail_start = time - (num_samples-1) * self.TRAIL_SAMPLE_INTERVAL
+                posns = pat_model.get_head_posns(user, trail_start, self.TRAIL_SAMPLE_INTERVAL, num_samples)
+                trail_xs = self._x_axis.value_to_pixel(posns[:, 0])
+                trail_ys = self._y_axis.value_to_pixel(posns[:, 2])
+                node.set_trail(zip(trail_xs.tolist(), trail_ys.tolist()))
             pos = user.getHeadPos(time)
             pixel_pos = avg.Point2D(self._x_axis.value_to_pixel(pos[0]), self._y_axis.value_to_pixel(pos[2]))
             viewpt = (self._x_axis.value_to_pixel(user.getWallViewpoint(time).x),
                     self._y_axis.value_to_pixel(0))
-            node = UserNode(user.getUserID(), pos=pixel_pos, viewpt=viewpt, parent=self._data_div)
-            self.__user_nodes.append(node)
+            node.set_pos(pixel_pos, viewpt)
 
     def __show_user_heatmap(self, time_interval):
         val_max = 6 * ((time_interval[1] - time_interval[0]) / 60.)
         for i, user in enumerate(self.__users):
             self.__heatmap_nodes[i].valuerangemax = val_max
             if self._vis_params.get_user_visible(i):
-                head_posns = user.getHeadXZPosns(time_interval[0], time_interval[1])
-                self.__heatmap_nodes[i].setPosns(head_posns)
+                counts = pat_model.get_head_xz_pos_heat_map(user, time_interval[0], time_interval[1],
+                        self.__heatmap_range[0], self.__heatmap_range[1], self.__heatmap_size)
+                self.__heatmap_nodes[i].setMatrix(counts.tolist())
             else:
                 self.__heatmap_nodes[i].setPosns([])
 
@@ -98,17 +115,35 @@ class FloorPanel(vis_panel.VisPanel):
 
 
 class UserNode(avg.DivNode):
+    """
+    Position and viewing direction of a user on the floor, optionally with the path the user walked recently.
+    The nodes are created once and moved by set_pos() and set_trail().
+    """
 
-    def __init__(self, userid, pos, viewpt, parent, **kwargs):
+    def __init__(self, userid, parent, show_trail=False, **kwargs):
         super(UserNode, self).__init__(**kwargs)
         self.registerInstance(self, parent)
 
         color = vis_params.VisParams.get_user_color(userid)
 
+        if show_trail:
+            self.__trail_node = avg.PolyLineNode(color=color, opacity=0.5, parent=self)
+        else:
+            self.__trail_node = None
+        self.__view_node = avg.LineNode(color=color, parent=self)
+        self.__pos_node = avg.CircleNode(r=6, fillopacity=1, color=color, fillcolor="000000", parent=self)
+
+    def set_pos(self, pos, viewpt):
         end_pos = avg.Point2D(viewpt)
         if (end_pos-pos).getNorm() > 200:
             dir = (end_pos-pos).getNormalized()
             end_pos = pos + dir*200
-        avg.LineNode(pos1=pos, pos2=end_pos, color=color, parent=self)
-
-        avg.CircleNode(pos=pos, r=6, fillopacity=1, color=color, fillcolor="000000", parent=self)
+        self.__view_node.pos1 = pos
+        self.__view_node.pos2 = end_pos
+        self.__pos_node.pos = pos
+
+    def set_trail(self, posns):
+        """
+        :param posns: list of pixel positions, oldest first.
+        """
+        self.__trail_node.pos = posns
@@ -0,0 +1,239 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# GIAnT Group Interaction Analysis Toolkit
+# Copyright (C) 2017 Interactive Media Lab Dresden
+# 
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# Writes synthetic optitrack and touch csv files in the format setup.py imports, e.g. to test how GIAnT scales
+# with the number of users, the session length and the number of touches.
+
+import argparse
+import os
+
+import numpy as np
+
+import pat_model
+
+DATE = "2017-01-01"
+START_TIME = "10:00:00"
+TOOLS = ["Pick", "Girder", "Lantern", "Ladder"]     # Touch tools in the csv file; one per user
+CHUNK_DURATION = 60.                                 # Seconds of data generated and written at once
+
+
+class SessionParams(object):
+
+    def __init__(self, num_users=4, duration=600., rate=60., touches_per_min=10., dropout_rate=0.5,
+            dropout_duration=1., seed=1):
+        """
+        :param num_users: Number of tracked users. Only the first len(TOOLS) users can touch the wall.
+        :param duration: Session length in seconds
+        :param rate: Optitrack samples per second and user
+        :param touches_per_min: Average number of touches per user and minute
+        :param dropout_rate: Average number of tracking dropouts per user and minute
+        :param dropout_duration: Average length of a tracking dropout in seconds
+        """
+        self.num_users = num_users
+        self.duration = duration
+        self.rate = rate
+        self.touches_per_min = touches_per_min
+        self.dropout_rate = dropout_rate
+        self.dropout_duration = dropout_duration
+        self.seed = seed
+
+    def get_filenames(self):
+        name = "synthetic_u{}_d{}_r{}_t{}".format(self.num_users, int(self.duration), int(self.rate),
+                int(self.touches_per_min))
+        return "optitrack_" + name + ".csv", "touch_" + name + ".csv"
+
+
+def format_csv_times(times):
+    """
+    :param times: seconds since START_TIME (array)
+    :return: list of hh:mm:ss.mil timestamps
+    """
+    start_h, start_m, start_s = [int(part) for part in START_TIME.split(":")]
+    millisecs = np.round(times * 1000).astype(np.int64) + ((start_h*60 + start_m)*60 + start_s) * 1000
+    secs, millisecs = np.divmod(millisecs, 1000)
+    mins, secs = np.divmod(secs, 60)
+    hours, mins = np.divmod(mins, 60)
+    return ["{:02d}:{:02d}:{:02d}.{:03d}".format(*parts) for parts in zip(hours, mins, secs, millisecs)]
+
+
+def fold(vals, min_val, max_val):
+    """
+    Reflects values at min_val and max_val until they lie in the range, so a path bounces off the borders.
+    """
+    period = 2 * (max_val - min_val)
+    vals = (vals - min_val) % period
+    return np.where(vals > max_val - min_val, period - vals, vals) + min_val
+
+
+class HeadGenerator(object):
+    """
+    Generates the head data of one user in chunks: The user walks around in front of the wall with a smoothly
+    changing velocity and mostly looks at the wall. Velocities and rotations are interpolated between random
+    control points one second apart.
+    """
+    POS_RANGE = [(0., pat_model.wall_width), (1.5, 1.9), (0.3, 2.5)]     # db coordinates, in meters
+    MAX_SPEED = np.array((0.8, 0.02, 0.5))                              # meters per second
+    MAX_ROT = np.array((0.8, 0.3, 0.1))                                 # yaw, pitch, roll in radians
+
+    def __init__(self, rng, params):
+        self.__rng = rng
+        self.__params = params
+        self.__pos = np.array([rng.uniform(min_val, max_val) for min_val, max_val in self.POS_RANGE])
+        # Control points that later samples still depend on, starting at __control_time.
+        self.__control_time = 0.
+        self.__control_vels = np.zeros((1, 3))
+        self.__control_rots = np.zeros((1, 3))
+        self.__dropout_end = -1.
+
+    def generate(self, start_time, end_time):
+        """
+        :return: times (seconds since the session start), positions and rotations (yaw, pitch, roll) in db
+            coordinates of the samples between start_time and end_time.
+        """
+        rng = self.__rng
+        params = self.__params
+        times = np.arange(np.ceil(start_time * params.rate), np.ceil(end_time * params.rate)) / params.rate
+        # Timestamp jitter
+        times = np.maximum(0, times + rng.uniform(-0.2, 0.2, len(times)) / params.rate)
+
+        num_controls = int(np.ceil(end_time - self.__control_time)) + 2
+        num_new_controls = max(0, num_controls - len(self.__control_vels))
+        control_times = self.__control_time + np.arange(num_controls)
+        control_vels = np.vstack((self.__control_vels,
+                rng.uniform(-1, 1, (num_new_controls, 3)) * self.MAX_SPEED))
+        control_rots = np.vstack((self.__control_rots,
+                rng.uniform(-1, 1, (num_new_controls, 3)) * self.MAX_ROT))
+        vels = np.column_stack([np.interp(times, control_times, control_vels[:, i]) for i in range(3)])
+        rots = np.column_stack([np.interp(times, control_times, control_rots[:, i]) for i in range(3)])
+
+        # Integrate the velocities from the last position; the path is reflected at the borders of the area.
+        unfolded_posns = self.__pos + np.cumsum(vels / params.rate, axis=0)
+        posns = np.column_stack([fold(unfolded_posns[:, i], *self.POS_RANGE[i]) for i in range(3)])
+        if len(times) > 0:
+            self.__pos = posns[-1]
+        # Keep the control points from the one before end_time on.
+        first_kept = int(end_time - self.__control_time)
+        self.__control_time = control_times[first_kept]
+        self.__control_vels = control_vels[first_kept:]
+        self.__control_rots = control_rots[first_kept:]
+
+        return self.__apply_dropouts(times, posns, rots)
+
+    def __apply_dropouts(self, times, posns, rots):
+        rng = self.__rng
+        params = self.__params
+        is_tracked = times > self.__dropout_end
+        dropout_prob = params.dropout_rate / 60. / params.rate
+        for i in np.flatnonzero(rng.rand(len(times)) < dropout_prob):
+            self.__dropout_end = times[i] + rng.exponential(params.dropout_duration)
+            is_tracked[(times >= times[i]) & (times <= self.__dropout_end)] = False
+        return times[is_tracked], posns[is_tracked], rots[is_tracked]
+
+
+def generate_touches(rng, params, userid, start_time, end_time):
+    """
+    :return: list of (time, x, y, tool) csv rows of the touches of a user between start_time and end_time.
+        Every touch is a short drag with one row per 1/60 s.
+    """
+    num_touches = rng.poisson(params.touches_per_min * (end_time - start_time) / 60.)
+    rows = []
+    for touch_time in np.sort(rng.uniform(start_time, end_time, num_touches)):
+        pos = rng.uniform((0, 0), pat_model.touch_range)
+        num_rows = 1 + rng.poisson(5)
+        for i in range(num_rows):
+            pos = np.clip(pos + rng.randn(2) * 5, (0, 0), pat_model.touch_range)
+            rows.append((touch_time + i / 60., int(pos[0]), int(pos[1]), TOOLS[userid]))
+    return rows
+
+
+def generate_session(params, data_dir):
+    """
+    Writes the optitrack and touch csv files to data_dir.
+    :return: filenames of the optitrack and touch files
+    """
+    rng = np.random.RandomState(params.seed)
+    optitrack_filename, touch_filename = params.get_filenames()
+    if not os.path.exists(data_dir):
+        os.makedirs(data_dir)
+
+    head_generators = [HeadGenerator(rng, params) for _ in range(params.num_users)]
+    with open(os.path.join(data_dir, optitrack_filename), "w") as optitrack_file, \
+            open(os.path.join(data_dir, touch_filename), "w") as touch_file:
+        optitrack_file.write("time,user,pos,rot\n")
+        touch_file.write("time,pos,tool\n")
+        for chunk_start in np.arange(0, params.duration, CHUNK_DURATION):
+            chunk_end = min(chunk_start + CHUNK_DURATION, params.duration)
+
+            # Head data of all users, sorted by time. The csv coordinate system is mirrored in x and z
+            # (see setup.resample_optitrack).
+            chunk = []
+            for userid, generator in enumerate(head_generators):
+                times, posns, rots = generator.generate(chunk_start, chunk_end)
+                for time, pos, rot in zip(times, posns, rots):
+                    chunk.append((time, userid+1, -pos[0], pos[1], -pos[2], rot[0], rot[1], rot[2]))
+            chunk.sort()
+            csv_times = format_csv_times(np.array([row[0] for row in chunk]))
+            optitrack_file.writelines('{},{},"({:f}, {:f}, {:f})","({:f}, {:f}, {:f})"\n'.format(
+                    csv_time, *row[1:]) for csv_time, row in zip(csv_times, chunk))
+
+            touch_rows = []
+            for userid in range(min(params.num_users, len(TOOLS))):
+                touch_rows += generate_touches(rng, params, userid, chunk_start, chunk_end)
+            touch_rows.sort()
+            csv_times = format_csv_times(np.array([row[0] for row in touch_rows]))
+            touch_file.writelines('{},"({}, {})",{}\n'.format(csv_time, *row[1:])
+                    for csv_time, row in zip(csv_times, touch_rows))
+    return optitrack_filename, touch_filename
+
+
+def create_session(params, data_dir, session_num=1):
+    """
+    :return: pat_model.Session for the files written by generate_session.
+    """
+    optitrack_filename, touch_filename = params.get_filenames()
+    return pat_model.Session(
+        session_num=session_num,
+        level_num=0,
+        data_dir=data_dir,
+        optitrack_filename=optitrack_filename,
+        touch_filename=touch_filename,
+        video_filename="",
+        date=DATE,
+        video_start_time=START_TIME,
+        video_time_offset=0.,
+        num_users=params.num_users,
+        tool_to_userid=range(len(TOOLS)),
+        user_pitch_offsets=[0.] * params.num_users
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Writes synthetic optitrack and touch csv files.")
+    parser.add_argument("data_dir", help="Directory the csv files are written to.")
+    parser.add_argument("--users", type=int, default=4, help="Number of users.")
+    parser.add_argument("--duration", type=float, default=10., help="Session length in minutes.")
+    parser.add_argument("--rate", type=float, default=60., help="Optitrack samples per second and user.")
+    parser.add_argument("--touches", type=float, default=10., help="Touches per user and minute.")
+    parser.add_argument("--dropouts", type=float, default=0.5, help="Tracking dropouts per user and minute.")
+    parser.add_argument("--dropout-duration", type=float, default=1., help="Average dropout length in seconds.")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed.")
+    args = parser.parse_args()
+    session_params = SessionParams(num_users=args.users, duration=args.duration*60, rate=args.rate,
+            touches_per_min=args.touches, dropout_rate=args.dropouts, dropout_duration=args.dropout_duration,
+            seed=args.seed)
+    for filename in generate_session(session_params, args.data_dir):
+        print "Wrote", os.path.join(args.data_dir, filename)
@@ -28,3 +28,6 @@ APP_MARGIN = 15                                     # space of content to applic
 APP_PADDING = 20                                    # space between content of application in px
 
 FONT_SIZE = 18
+
+"""visualization values"""
+FLOOR_TRAIL_DURATION = 5                            # length of the user paths in the floor panel in s, 0 to hide
@@ -15,6 +15,10 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import functools
+import time
+
+
 def unlink_node_list(node_list):
     for node in node_list:
         node.unlink(True)
@@ -27,3 +31,54 @@ def format_time(value, show_ms=True):
     if show_ms and ms != 0:
         time_str += ".{:03d}".format(ms)
     return time_str
+
+
+class UpdateProfiler(object):
+    """
+    Collects the time the panels spend in their update handlers per frame, to find panels that exceed the frame
+    budget.
+    """
+    FRAME_BUDGET = 1/60.    # Time per frame in seconds
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.__frame_times = {}     # Panel name -> time spent in the current frame
+        self.__stats = {}           # Panel name -> [frames, total time, max. time per frame, frames over budget]
+
+    def add_time(self, label, duration):
+        self.__frame_times[label] = self.__frame_times.get(label, 0.) + duration
+
+    def end_frame(self):
+        for label, duration in self.__frame_times.iteritems():
+            stats = self.__stats.setdefault(label, [0, 0., 0., 0])
+            stats[0] += 1
+            stats[1] += duration
+            stats[2] = max(stats[2], duration)
+            if duration > self.FRAME_BUDGET:
+                stats[3] += 1
+        self.__frame_times = {}
+
+    def print_summary(self):
+        print "{:<20}{:>8}{:>12}{:>12}{:>14}".format("Panel", "Frames", "Avg (ms)", "Max (ms)", "Over budget")
+        for label, stats in sorted(self.__stats.iteritems(), key=lambda item: -item[1][1]):
+            num_frames, total_time, max_time, num_over_budget = stats
+            print "{:<20}{:>8}{:>12.2f}{:>12.2f}{:>14}".format(label, num_frames, total_time/num_frames*1000,
+                    max_time*1000, num_over_budget)
+
+update_profiler = UpdateProfiler()
+
+
+def profiled(func):
+    """
+    Decorator for update handler methods: Adds the time spent in the method to update_profiler under the class name.
+    """
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        start_time = time.time()
+        try:
+            return func(self, *args, **kwargs)
+        finally:
+            update_profiler.add_time(type(self).__name__, time.time() - start_time)
+    return wrapper
@@ -26,6 +26,7 @@ import video_panel
 import options_panel
 import stats_panel
 import global_values
+import helper
 import pat_model
 
 
@@ -69,7 +70,8 @@ class MainDiv(app.MainDiv):
                 session=self.session, vis_params=self.__vis_params, parent=self)
         panel11_pos = avg.Point2D(panel_size.x + padding, self.wall_panel.height + 5)
         self.floor_panel = floor_panel.FloorPanel(pos=panel11_pos, size=panel_size,
-                session=self.session, vis_params=self.__vis_params, parent=self)
+                session=self.session, vis_params=self.__vis_params,
+                trail_duration=global_values.FLOOR_TRAIL_DURATION, parent=self)
         panel12_pos = panel11_pos + (0, self.floor_panel.height + 5)
         self.stats_panel = stats_panel.StatsPanel(pos=panel12_pos, size=(panel_size.x, vis_area_size.y - panel12_pos.y),
                 session=self.session, vis_params=self.__vis_params, parent=self)
@@ -85,12 +87,14 @@ class MainDiv(app.MainDiv):
         app.keyboardmanager.bindKeyDown(keyname='Down', handler=self.zoom_out, help="Zoom out")
         app.keyboardmanager.bindKeyDown(keyname='Space', handler=self.play_pause, help="Play/pause")
         app.keyboardmanager.bindKeyDown(keyname='Q', handler=self.toggle_main_panel, help="Toggle timeline panel")
+        app.keyboardmanager.bindKeyDown(keyname='P', handler=helper.update_profiler.print_summary,
+                help="Print panel update times")
         for i in range(0,4):
             app.keyboardmanager.bindKeyDown(keyname=str(i+1),
                     handler=lambda userid=i: self.toggle_user_visible(userid),
                     help = "Toggle user "+str(i+1))
 
-        self.__vis_params.set_time_interval((0, self.session.duration))
+        self.__vis_params.notify_all()
 
     def zoom_in(self):
         self.__vis_params.zoom_in_at(0.5)
@@ -114,7 +118,7 @@ class MainDiv(app.MainDiv):
         self.timeline_panel.unlink()
         self.timeline_panel = movement_panel.MovementPanel(pos=pos, size=size,
                 session=self.session, vis_params=self.__vis_params, is_dist_view=self.__show_dist_view, parent=self)
-        self.__vis_params.notify()
+        self.__vis_params.notify_all()
 
 
     def toggle_user_visible(self, userid):
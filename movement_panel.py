@@ -17,9 +17,11 @@
 
 import math
 import copy
+import numpy as np
 
 import pat_model
 import global_values
+import helper
 import vis_panel
 from libavg import avg, player, gesture
 
@@ -64,6 +66,9 @@ class MovementPanel(vis_panel.VisPanel):
         self.__hover_id = self._data_div.subscribe(avg.Node.CURSOR_MOTION, self.__on_hover)
 
         self.__enable_time = True
+        vis_params.subscribe(vis_params.HIGHLIGHT_TIME_CHANGED, self.__update_highlight_line)
+        vis_params.subscribe(vis_params.USER_VISIBILITY_CHANGED, self.__update_user_visibility)
+        vis_params.subscribe(vis_params.SMOOTHNESS_CHANGED, self.__update_smoothness)
         vis_params.subscribe(vis_params.IS_PLAYING, self.__on_play_pause)
 
         self._data_div.subscribe(avg.Node.MOUSE_WHEEL, self.__on_mouse_wheel)
@@ -74,13 +79,22 @@ class MovementPanel(vis_panel.VisPanel):
                 upHandler=self.__on_drag
                 )
 
+    @helper.profiled
     def _update_time(self, vis_params):
         interval = vis_params.get_time_interval()
         self.__time_min = interval[0]
         self.__time_factor = self._data_div.width / vis_params.get_time_duration()
         self.__create_lines(vis_params)
+        self.__update_highlight_line(vis_params)
+
+        self._x_axis.hide_rims = not(math.fabs(vis_params.get_time_duration() - self.__duration) < 0.0001)
+        self._x_axis.update(interval[0], interval[1])
+        self._update_grid()
+
+    @helper.profiled
+    def __update_highlight_line(self, vis_params):
         # update position of pinned highlight line and highlight line marker
-        highlight_xpos = self.__time_to_xpos(self._vis_params.highlight_time)
+        highlight_xpos = self.__time_to_xpos(vis_params.highlight_time)
         if highlight_xpos > self.width or highlight_xpos < 0:
             self.__highlight_line.opacity = 0
         else:
@@ -88,12 +102,15 @@ class MovementPanel(vis_panel.VisPanel):
             self.__highlight_line.pos1 = (highlight_xpos, self.__highlight_line.pos1[1])
             self.__highlight_line.pos2 = (highlight_xpos, self.__highlight_line.pos2[1])
 
+    @helper.profiled
+    def __update_user_visibility(self, vis_params):
+        self.__create_lines(vis_params)
         for i, user_line in enumerate(self.__user_lines):
             user_line.active = vis_params.get_user_visible(i)
 
-        self._x_axis.hide_rims = not(math.fabs(vis_params.get_time_duration() - self.__duration) < 0.0001)
-        self._x_axis.update(interval[0], interval[1])
-        self._update_grid()
+    @helper.profiled
+    def __update_smoothness(self, vis_params):
+        self.__create_lines(vis_params)
 
     def __on_play_pause(self, playing):
         self.__enable_time = not playing
@@ -119,31 +136,29 @@ class MovementPanel(vis_panel.VisPanel):
         x_extent = float(pos_range[1][0] - pos_range[0][0])
         y_extent = float(pos_range[1][2] - pos_range[0][2])
         vis_height = self._data_div.height
+        sample_xs = np.arange(0, int(self._data_div.width), self.PIXELS_PER_SAMPLE)
+        time_step = self.PIXELS_PER_SAMPLE / self.__time_factor
         for i, user in enumerate(self.__users):
             if vis_params.get_user_visible(i):
-                points = []
-                dists = []
-                for cur_sample_x in range(0, int(self._data_div.width), self.PIXELS_PER_SAMPLE):
-                    cur_time = self.__xpos_to_time(cur_sample_x)
-
-                    head_position_averaged = user.getHeadPosAvg(cur_time, smoothness)
-
-                    norm_x = (head_position_averaged[0] - pos_range[0][0]) / x_extent
-                    norm_z = (head_position_averaged[2] - pos_range[0][2]) / y_extent
-
-                    if self.__is_dist_view:
-                        vis_y = (1 - norm_z) * vis_height
-                        dists.append(2)
-                    else:
-                        vis_y = (1 - norm_x) * vis_height
-                        dists.append(norm_z)
-                    points.append((cur_sample_x, vis_y))
+                head_posns_averaged = pat_model.get_head_pos_avgs(user, time_start, time_step, len(sample_xs),
+                        smoothness)
+
+                norm_x = (head_posns_averaged[:, 0] - pos_range[0][0]) / x_extent
+                norm_z = (head_posns_averaged[:, 2] - pos_range[0][2]) / y_extent
+
+                if self.__is_dist_view:
+                    vis_ys = (1 - norm_z) * vis_height
+                    dists = np.full(len(sample_xs), 2)
+                else:
+                    vis_ys = (1 - norm_x) * vis_height
+                    dists = norm_z
+                points = np.column_stack((sample_xs, vis_ys)).astype(np.float32)
                 userline = self.__user_lines[i]
-                userline.setValues(points, dists)
-                touches = user.getTouches(time_start, time_end)
-                touches_x = [self.__time_to_xpos(touch.time) for touch in touches]
-                touches_width = [touch.duration*self.__time_factor for touch in touches]
-                userline.setHighlights(touches_x, touches_width)
+                userline.setValueArrays(points, dists.astype(np.float32))
+                touch_times, _, touch_durations = pat_model.get_touch_arrays(user, time_start, time_end)
+                touches_x = (touch_times - time_start) * self.__time_factor
+                touches_width = touch_durations * self.__time_factor
+                userline.setHighlightArrays(touches_x.astype(np.float32), touches_width.astype(np.float32))
 
     def __create_wall_rect(self):
         if self.__is_dist_view:
@@ -0,0 +1,353 @@
+# -*- coding: utf-8 -*-
+# GIAnT Group Interaction Analysis Toolkit
+# Copyright (C) 2017 Interactive Media Lab Dresden
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# Pure numpy implementation of the data part of the plots plugin (User, Touch and simplifyPath). It doesn't need
+# libavg or OpenGL, so sessions can be analyzed and benchmarked on machines without a display. Select it by
+# setting the environment variable GIANT_BACKEND=numpy before pat_model is imported (see pat_model.BACKEND).
+#
+# The results match the plugin: Time arguments are rounded to float32 like in the C++ interface, and the
+# calculations use the same precision. Differences to the plugin:
+# - Functions that return lists of points in the plugin (getHeadXZPosns, getHeadViewpoints, getTouchPosns)
+#   return n x 2 float32 arrays. Like the lists, these are copies, so callers can modify them.
+# - addHeadData and addTouch aren't supported; use setHeadData and setTouches.
+
+import collections
+import heapq
+
+import numpy as np
+
+Point2D = collections.namedtuple("Point2D", "x y")
+Point3D = collections.namedtuple("Point3D", "x y z")
+
+
+def _to_float(val):
+    # Rounds a value like the conversion to a C++ float argument.
+    return float(np.float32(val))
+
+
+def _point(vals):
+    if len(vals) == 2:
+        return Point2D(*vals.tolist())
+    else:
+        return Point3D(*vals.tolist())
+
+
+class Touch(object):
+
+    def __init__(self, userid, pos, time, duration):
+        self.userid = userid
+        self.pos = Point2D(*pos)
+        self.time = _to_float(time)
+        self.duration = _to_float(duration)
+
+
+class User(object):
+
+    def __init__(self, userid, start_time, duration):
+        """
+        :param start_time: Session start; all time parameters below are relative to it.
+        """
+        self.__userid = userid
+        self.__start_time = float(start_time)
+        self.__duration = _to_float(duration)
+
+        self.setHeadData(np.zeros(0), np.zeros((0, 3)), np.zeros((0, 3)), np.zeros((0, 3)), np.zeros((0, 2)))
+        self.setTouches(np.zeros(0), np.zeros((0, 2)), np.zeros(0))
+
+    def setHeadData(self, times, posns, rots, pos_prefix_sums, wall_viewpoints=None):
+        """
+        The arrays aren't copied if they already have the right types (float64 times, float32 otherwise).
+        If wall_viewpoints is None, the viewpoints are calculated from the head positions and rotations.
+        """
+        self.__times = np.ascontiguousarray(times, dtype=np.float64)
+        self.__posns = np.ascontiguousarray(posns, dtype=np.float32).reshape(-1, 3)
+        self.__rots = np.ascontiguousarray(rots, dtype=np.float32).reshape(-1, 3)
+        self.__pos_prefix_sums = np.ascontiguousarray(pos_prefix_sums, dtype=np.float32).reshape(-1, 3)
+        if wall_viewpoints is None:
+            import pat_model
+            wall_viewpoints = pat_model.calc_wall_viewpoints(self.__posns, self.__rots)
+        self.__wall_viewpoints = np.ascontiguousarray(wall_viewpoints, dtype=np.float32).reshape(-1, 2)
+        num_samples = len(self.__times)
+        for name, array in (("posns", self.__posns), ("rots", self.__rots),
+                ("pos_prefix_sums", self.__pos_prefix_sums), ("wall_viewpoints", self.__wall_viewpoints)):
+            if len(array) != num_samples:
+                raise ValueError("User.setHeadData: All arrays must have the same length ({}).".format(name))
+
+        # Running sums for the interval statistics, see User.h.
+        xz_posns = self.__posns[:, 0::2]
+        deltas = xz_posns[1:] - xz_posns[:-1]
+        dists = np.sqrt(deltas[:, 0]*deltas[:, 0] + deltas[:, 1]*deltas[:, 1])
+        self.__cum_dist = np.concatenate(([0.], np.cumsum(dists, dtype=np.float64)))
+        self.__cum_z = np.concatenate(([0.], np.cumsum(self.__posns[:, 2], dtype=np.float64)))
+        self.__heat_maps = {}
+
+    def setTouches(self, times, posns, durations):
+        times = np.asarray(times, dtype=np.float32)
+        posns = np.asarray(posns, dtype=np.float32).reshape(-1, 2)
+        durations = np.asarray(durations, dtype=np.float32)
+        if not len(times) == len(posns) == len(durations):
+            raise ValueError("User.setTouches: All arrays must have the same length.")
+        order = np.argsort(times, kind="mergesort")
+        self.__touch_times = np.ascontiguousarray(times[order])
+        self.__touch_posns = np.ascontiguousarray(posns[order])
+        self.__touch_durations = np.ascontiguousarray(durations[order])
+
+    def getUserID(self):
+        return self.__userid
+
+    def getHeadPos(self, time):
+        return _point(self.__posns[self.__time_to_index(time)])
+
+    def getWallViewpoint(self, time):
+        return _point(self.__wall_viewpoints[self.__time_to_index(time)])
+
+    def getHeadRot(self, time):
+        return _point(self.__rots[self.__time_to_index(time)])
+
+    def getHeadPosAvg(self, time, smoothness):
+        return _point(self.__get_head_pos_avgs_at_indexes(self.__time_to_index(time), smoothness))
+
+    def getHeadPosns(self, start_time, time_step, num_samples):
+        """
+        :return: getHeadPos() at num_samples times as string of float32 values, like the plugin.
+        """
+        sample_times = np.float32(start_time) + np.arange(num_samples, dtype=np.float32) * np.float32(time_step)
+        return self.__posns[self.__time_to_index(sample_times)].tostring()
+
+    def getHeadPosAvgs(self, start_time, time_step, num_samples, smoothness):
+        """
+        :return: string of float32 values, like the plugin.
+        """
+        sample_times = np.float32(start_time) + np.arange(num_samples, dtype=np.float32) * np.float32(time_step)
+        indexes = self.__time_to_index(sample_times)
+        return self.__get_head_pos_avgs_at_indexes(indexes, smoothness).tostring()
+
+    def getHeadPosExtents(self, start_time, end_time, num_buckets):
+        """
+        :return: tuple of two strings of float32 values (minimums, maximums), like the plugin.
+        """
+        self.__check_head_data()
+        start_time = np.float32(start_time)
+        bucket_duration = (np.float32(end_time) - start_time) / np.float32(num_buckets)
+        bucket_starts = start_time + np.arange(num_buckets + 1, dtype=np.float32) * bucket_duration
+        # Bucket i covers the samples [indexes[i], indexes[i+1]). In reversed intervals, all buckets are empty.
+        indexes = self.__first_index_after(bucket_starts)
+        is_empty = indexes[:-1] >= indexes[1:]
+
+        # Empty buckets contain the position at the bucket start.
+        mins = self.__posns[self.__time_to_index(bucket_starts[:-1])]
+        maxs = mins.copy()
+        if not is_empty.all():
+            # Empty buckets have zero length, so the next bucket with samples starts where the previous one ends.
+            starts = indexes[:-1][~is_empty]
+            posns = self.__posns[:indexes[1:][~is_empty].max()]
+            mins[~is_empty] = np.minimum.reduceat(posns, starts)
+            maxs[~is_empty] = np.maximum.reduceat(posns, starts)
+        return mins.tostring(), maxs.tostring()
+
+    def getDistTravelled(self, start_time, end_time, epsilon=None):
+        """
+        :param epsilon: If not None, the length of the xz path after Ramer-Douglas-Peucker simplification.
+        """
+        if epsilon is not None:
+            posns = self.getHeadXZPosns(start_time, end_time)
+            kept_posns = posns[_simplify_path_rdp(posns, np.float32(epsilon))]
+            deltas = kept_posns[1:] - kept_posns[:-1]
+            dists = np.sqrt(deltas[:, 0]*deltas[:, 0] + deltas[:, 1]*deltas[:, 1])
+            # Summed in order, like the plugin (np.sum adds pairwise).
+            return _to_float(np.cumsum(dists, dtype=np.float64)[-1]) if len(dists) > 0 else 0.0
+        start_i, end_i = self.__get_index_range(start_time, end_time)
+        if end_i - start_i < 2:
+            return 0.0
+        return _to_float(self.__cum_dist[end_i-1] - self.__cum_dist[start_i])
+
+    def getAvgDistFromWall(self, start_time, end_time):
+        start_i, end_i = self.__get_index_range(start_time, end_time)
+        if end_i <= start_i:
+            return 0.0
+        return _to_float((self.__cum_z[end_i] - self.__cum_z[start_i]) / (end_i - start_i))
+
+    def getHeadXZPosns(self, start_time, end_time):
+        start_i, end_i = self.__get_index_range(start_time, end_time)
+        return self.__posns[start_i:end_i, 0::2].copy()
+
+    def getHeadViewpoints(self, start_time, end_time):
+        start_i, end_i = self.__get_index_range(start_time, end_time)
+        return self.__wall_viewpoints[start_i:end_i].copy()
+
+    def getHeadXZPosHeatMap(self, start_time, end_time, range_min, range_max, map_size):
+        return self.__get_heat_map("xz_posns", self.__posns[:, 0::2], start_time, end_time, range_min, range_max,
+                map_size)
+
+    def getHeadViewpointHeatMap(self, start_time, end_time, range_min, range_max, map_size):
+        return self.__get_heat_map("viewpoints", self.__wall_viewpoints, start_time, end_time, range_min,
+                range_max, map_size)
+
+    def countTouches(self, start_time, end_time):
+        first, last = self.getTouchIndexRange(start_time, end_time)
+        return last - first
+
+    def getTouches(self, start_time, end_time):
+        first, last = self.getTouchIndexRange(start_time, end_time)
+        return [Touch(self.__userid, self.__touch_posns[i], self.__touch_times[i], self.__touch_durations[i])
+                for i in range(first, last)]
+
+    def getTouchPosns(self, start_time, end_time):
+        first, last = self.getTouchIndexRange(start_time, end_time)
+        return self.__touch_posns[first:last].copy()
+
+    def getTouchArrays(self, start_time, end_time):
+        """
+        :return: tuple of three strings of float32 values (times, positions, durations), like the plugin.
+        """
+        first, last = self.getTouchIndexRange(start_time, end_time)
+        return (self.__touch_times[first:last].tostring(), self.__touch_posns[first:last].tostring(),
+                self.__touch_durations[first:last].tostring())
+
+    def getTouchIndexRange(self, start_time, end_time):
+        """
+        :return: Index range [first, last) of the touches between start_time and end_time (inclusive).
+        """
+        first = int(np.searchsorted(self.__touch_times, np.float32(start_time), side="left"))
+        last = int(np.searchsorted(self.__touch_times, np.float32(end_time), side="right"))
+        return first, max(first, last)
+
+    def __first_index_after(self, time):
+        """
+        :return: Index of the first sample later than time (the number of samples if there is none). time can be
+            a scalar or an array.
+        """
+        abs_time = self.__start_time + np.asarray(time, dtype=np.float32).astype(np.float64)
+        return np.searchsorted(self.__times, abs_time, side="right")
+
+    def __time_to_index(self, time):
+        self.__check_head_data()
+        return np.maximum(0, self.__first_index_after(time) - 1)
+
+    def __get_index_range(self, start_time, end_time):
+        return int(self.__first_index_after(start_time)), int(self.__first_index_after(end_time))
+
+    def __get_head_pos_avgs_at_indexes(self, indexes, smoothness):
+        start_sums = self.__pos_prefix_sums[np.maximum(0, indexes - smoothness//2)]
+        end_sums = self.__pos_prefix_sums[np.minimum(len(self.__times)-1, indexes + (smoothness+1)//2)]
+        return (end_sums - start_sums) / np.float32(smoothness)
+
+    def __get_heat_map(self, name, posns, start_time, end_time, range_min, range_max, map_size):
+        """
+        :return: string of float32 counts per cell, row by row (see HeatMapAccumulator in the plugin).
+        """
+        params = (tuple(range_min), tuple(range_max), tuple(map_size))
+        if self.__heat_maps.get(name, (None,))[0] != params:
+            range_min = np.array(range_min, dtype=np.float32)
+            range_max = np.array(range_max, dtype=np.float32)
+            cell_posns = np.floor((posns - range_min) / (range_max - range_min) * np.array(map_size, np.float32))
+            is_inside = ((cell_posns >= 0) & (cell_posns < map_size)).all(axis=1)
+            cells = np.where(is_inside, cell_posns[:, 1] * map_size[0] + cell_posns[:, 0], -1).astype(np.int32)
+            self.__heat_maps[name] = (params, cells)
+        cells = self.__heat_maps[name][1]
+        start_i, end_i = self.__get_index_range(start_time, end_time)
+        cells = cells[start_i:end_i]
+        counts = np.bincount(cells[cells != -1], minlength=map_size[0]*map_size[1])
+        return counts.astype(np.float32).tostring()
+
+    def __check_head_data(self):
+        if len(self.__times) == 0:
+            raise RuntimeError("User {} has no head data.".format(self.__userid))
+
+
+def simplifyPath(pts, tolerance, mode="rdp"):
+    """
+    :return: string of int32 indexes of the points to keep, like the plugin.
+    """
+    pts = np.ascontiguousarray(pts, dtype=np.float32).reshape(-1, 2)
+    if mode == "rdp":
+        kept_indexes = _simplify_path_rdp(pts, np.float32(tolerance))
+    elif mode == "vw":
+        kept_indexes = _simplify_path_vw(pts, np.float32(tolerance))
+    else:
+        raise ValueError("simplifyPath: mode must be 'rdp' or 'vw'.")
+    return kept_indexes.astype(np.int32).tostring()
+
+
+def _simplify_path_rdp(pts, epsilon):
+    """
+    Ramer-Douglas-Peucker with a stack of segments, like simplifyPathRDP in the plugin. The distances of the
+    points of a segment are calculated at once.
+    """
+    num_pts = len(pts)
+    if num_pts < 3:
+        return np.arange(num_pts)
+    keep = np.zeros(num_pts, dtype=bool)
+    keep[[0, -1]] = True
+    segments = [(0, num_pts-1)]
+    while segments:
+        first, last = segments.pop()
+        if last - first < 2:
+            continue
+        line_dir = pts[last] - pts[first]
+        rel_pts = pts[first+1:last] - pts[first]
+        line_length = np.sqrt(line_dir[0]*line_dir[0] + line_dir[1]*line_dir[1])
+        if line_length == 0:
+            dists = np.sqrt(rel_pts[:, 0]*rel_pts[:, 0] + rel_pts[:, 1]*rel_pts[:, 1])
+        else:
+            dists = np.fabs(line_dir[0]*rel_pts[:, 1] - line_dir[1]*rel_pts[:, 0]) / line_length
+        max_index = int(np.argmax(dists))
+        if dists[max_index] > epsilon:
+            max_index += first + 1
+            keep[max_index] = True
+            segments.append((first, max_index))
+            segments.append((max_index, last))
+    return np.flatnonzero(keep)
+
+
+def _calc_triangle_area(pt1, pt2, pt3):
+    return np.fabs((pt2[0]-pt1[0])*(pt3[1]-pt1[1]) - (pt3[0]-pt1[0])*(pt2[1]-pt1[1])) / np.float32(2)
+
+
+def _simplify_path_vw(pts, min_area):
+    """
+    Visvalingam-Whyatt with a heap of (area, index) and a linked list of the remaining points, like
+    simplifyPathVW in the plugin.
+    """
+    num_pts = len(pts)
+    keep = np.ones(num_pts, dtype=bool)
+    if num_pts < 3:
+        return np.flatnonzero(keep)
+    prevs = range(-1, num_pts-1)
+    nexts = range(1, num_pts+1)
+    pts = [(x, y) for x, y in zip(pts[:, 0], pts[:, 1])]     # float32 scalars; indexing arrays is slow
+    areas = [None] + [_calc_triangle_area(pts[i-1], pts[i], pts[i+1]) for i in range(1, num_pts-1)] + [None]
+    heap = [(areas[i], i) for i in range(1, num_pts-1)]
+    heapq.heapify(heap)
+    while heap:
+        area, i = heapq.heappop(heap)
+        if not keep[i] or area != areas[i]:
+            continue
+        if area >= min_area:
+            break
+        keep[i] = False
+        p = prevs[i]
+        n = nexts[i]
+        nexts[p] = n
+        prevs[n] = p
+        if p != 0:
+            areas[p] = max(area, _calc_triangle_area(pts[prevs[p]], pts[p], pts[n]))
+            heapq.heappush(heap, (areas[p], p))
+        if n != num_pts-1:
+            areas[n] = max(area, _calc_triangle_area(pts[p], pts[n], pts[nexts[n]]))
+            heapq.heappush(heap, (areas[n], n))
+    return np.flatnonzero(keep)
@@ -59,7 +59,8 @@ class OptionsPanel(libavg.DivNode):
         self.__init_time_bar(duration)
 #        self.__init_smoothness_slider()
 
-        self.__vis_params.subscribe(self.__vis_params.CHANGED, self.__update_time)
+        self.__vis_params.subscribe(self.__vis_params.TIME_INTERVAL_CHANGED, self.__update_time)
+        self.__vis_params.subscribe(self.__vis_params.HIGHLIGHT_TIME_CHANGED, self.__update_highlight_time)
         self.__vis_params.subscribe(self.__vis_params.IS_PLAYING, self.__on_play_pause)
 
     def __init_time_bar(self, duration):
@@ -109,10 +110,14 @@ class OptionsPanel(libavg.DivNode):
     def __play_pause(self, checked):
         self.__vis_params.is_playing = not self.__vis_params.is_playing
 
+    @helper.profiled
     def __update_time(self, vis_params):
         interval = vis_params.get_time_interval()
         self.__time_slider.setThumbPos(interval[0])
         self.__time_slider.setThumbExtent(interval[1] - interval[0])
+
+    @helper.profiled
+    def __update_highlight_time(self, vis_params):
         cur_time = vis_params.highlight_time
         line_x = (cur_time/self.__duration)*self.__time_slider.width
         self.__cur_time_line.pos1 = (line_x, 23)
@@ -18,10 +18,20 @@
 import time
 import sqlite3
 import math
-from libavg import avg, player
+import itertools
+import threading
+import numpy as np
 import glob, os
+import session_cache
 
-player.loadPlugin("pyglm")
+# Implementation of plots.User and the other data queries: "plots" is the libavg plugin (loaded by the panels),
+# "numpy" is numpy_plots, which runs without libavg and OpenGL. Set with the environment variable GIANT_BACKEND
+# before this module is imported.
+BACKEND = os.environ.get("GIANT_BACKEND", "plots")
+if BACKEND == "numpy":
+    import numpy_plots as plots
+elif BACKEND != "plots":
+    raise ValueError("Unknown GIANT_BACKEND '{}', must be 'plots' or 'numpy'.".format(BACKEND))
 
 wall_width = 4.90
 wall_height = 2.06
@@ -31,31 +41,170 @@ time_offset = 0
 touch_range = [4*1920, 3*1080]
 x_wall_range = [0, wall_width]
 y_wall_range = [0.4, 0.4+wall_height]
+head_y_offset = -0.2    # Correction of the tracked head positions in y direction
 
+DB_FILENAME = "db"
+
+
+class Database(object):
+    """
+    Keeps one open connection to the sqlite database per thread instead of connecting for every query.
+    """
+    CACHE_SIZE = 64*1024                 # Page cache size in KiB
+    MMAP_SIZE = 1024*1024*1024           # Maximum number of bytes of the db file accessed via mmap
+
+    def __init__(self, filename):
+        self.__filename = filename
+        self.__local = threading.local()
+
+    def get_connection(self):
+        # Connections must not be shared with forked (import worker) processes.
+        if getattr(self.__local, "pid", None) != os.getpid():
+            self.__local.con = self.__connect()
+            self.__local.pid = os.getpid()
+        return self.__local.con
+
+    def execute(self, qry, params=(), do_fetch=False):
+        con = self.get_connection()
+        cur = con.execute(qry, params)
+        if do_fetch:
+            data = cur.fetchall()
+        con.commit()
+        if do_fetch:
+            return data
+
+    def iterate(self, qry, params=()):
+        """
+        Generator that yields the result rows of a query without building a list of all rows first.
+        """
+        cur = self.get_connection().execute(qry, params)
+        for row in cur:
+            yield row
+
+    def close(self):
+        if getattr(self.__local, "pid", None) == os.getpid():
+            self.__local.con.close()
+        self.__local.con = None
+        self.__local.pid = None
+
+    def __connect(self):
+        con = sqlite3.connect(self.__filename)
+        con.execute("PRAGMA journal_mode=WAL;")
+        con.execute("PRAGMA synchronous=NORMAL;")
+        con.execute("PRAGMA cache_size=-{};".format(self.CACHE_SIZE))
+        con.execute("PRAGMA mmap_size={};".format(self.MMAP_SIZE))
+        con.execute("PRAGMA temp_store=MEMORY;")
+        return con
+
+db = Database(DB_FILENAME)
+
+
+def get_connection():
+    return db.get_connection()
+
+
+def execute_qry(qry, do_fetch=False, params=()):
+    return db.execute(qry, params, do_fetch)
+
+
+def iterate_qry(qry, params=()):
+    return db.iterate(qry, params)
+
+
+def read_qry_array(qry, num_columns, params=()):
+    """
+    Reads the result of a query with num_columns numeric columns into a float64 array (n x num_columns). The rows
+    are streamed into the array, so no list of all rows is built first.
+    """
+    values = itertools.chain.from_iterable(iterate_qry(qry, params))
+    return np.fromiter(values, dtype=np.float64).reshape(-1, num_columns)
+
+
+def calc_wall_viewpoints(posns, rots):
+    """
+    Intersects the gaze rays of a series of head positions with the wall plane (z=0).
+    :param posns: head positions (n x 3 array)
+    :param rots: head rotations as yaw, pitch, roll (n x 3 array)
+    :return: n x 2 array of wall viewpoints, (0,0) if the gaze is parallel to the wall.
+    """
+    posns = np.asarray(posns, dtype=np.float64)
+    rots = np.asarray(rots, dtype=np.float64)
+    # Head direction: (0,0,1) rotated by yaw * pitch * roll. Roll doesn't change the direction.
+    yaw = rots[:, 0]
+    pitch = rots[:, 1]
+    head_dirs = np.column_stack((np.sin(yaw) * np.cos(pitch), -np.sin(pitch), np.cos(yaw) * np.cos(pitch)))
+
+    viewpts = np.zeros((len(posns), 2))
+    is_valid = np.fabs(head_dirs[:, 2]) > 0.000000001
+    lengths = -posns[is_valid, 2] / head_dirs[is_valid, 2]
+    viewpts[is_valid] = posns[is_valid, 0:2] + head_dirs[is_valid, 0:2] * lengths[:, np.newaxis]
+    return viewpts
 
-def execute_qry(qry, do_fetch=False):
-    con = sqlite3.connect("db")
-    cur = con.cursor()
-    cur.execute(qry)
-    if do_fetch:
-        data = cur.fetchall()
-    con.commit()
-    con.close()
-    if do_fetch:
-        return data
-
-
-def line_plane_intersect(line_pt, line_dir, plane_pt, plane_normal):
-    line_pt = pyglm.vec3(line_pt)
-    line_dir = pyglm.vec3(line_dir)
-    plane_pt = pyglm.vec3(plane_pt)
-    numerator = pyglm.vec3.dot(plane_pt - line_pt, plane_normal)
-    denominator = pyglm.vec3.dot(line_dir, plane_normal)
-    if math.fabs(denominator) > 0.000000001:
-        length = numerator/denominator
-        return pyglm.vec3(line_pt + pyglm.vec3(line_dir.getNormalized())*length)
-    else:
-        return None
+
+def get_touch_arrays(user, start_time, end_time):
+    """
+    :return: times, positions (n x 2) and durations of the touches of a user between start_time and end_time as
+        float32 arrays.
+    """
+    times, posns, durations = user.getTouchArrays(start_time, end_time)
+    return (np.frombuffer(times, dtype=np.float32),
+            np.frombuffer(posns, dtype=np.float32).reshape(-1, 2),
+            np.frombuffer(durations, dtype=np.float32))
+
+
+def get_head_posns(user, start_time, time_step, num_samples):
+    """
+    :return: Head positions of a user at num_samples times starting at start_time (num_samples x 3 array).
+    """
+    posns = user.getHeadPosns(start_time, time_step, num_samples)
+    return np.frombuffer(posns, dtype=np.float32).reshape(-1, 3)
+
+
+def get_head_pos_avgs(user, start_time, time_step, num_samples, smoothness):
+    """
+    :return: Smoothed head positions of a user at num_samples times starting at start_time (num_samples x 3 array).
+    """
+    posns = user.getHeadPosAvgs(start_time, time_step, num_samples, smoothness)
+    return np.frombuffer(posns, dtype=np.float32).reshape(-1, 3)
+
+
+def get_head_pos_extents(user, start_time, end_time, num_buckets):
+    """
+    :return: Minimum and maximum head positions of a user in num_buckets equal parts of the time interval
+        (two num_buckets x 3 arrays).
+    """
+    mins, maxs = user.getHeadPosExtents(start_time, end_time, num_buckets)
+    return (np.frombuffer(mins, dtype=np.float32).reshape(-1, 3),
+            np.frombuffer(maxs, dtype=np.float32).reshape(-1, 3))
+
+
+def get_head_xz_pos_heat_map(user, start_time, end_time, range_min, range_max, map_size):
+    """
+    :return: Number of xz head positions of a user between start_time and end_time in each cell of a map_size grid
+        covering range_min..range_max (map_size[1] x map_size[0] array, same binning as HeatMapNode.setPosns).
+    """
+    counts = user.getHeadXZPosHeatMap(start_time, end_time, range_min, range_max, map_size)
+    return np.frombuffer(counts, dtype=np.float32).reshape(map_size[1], map_size[0])
+
+
+def get_head_viewpoint_heat_map(user, start_time, end_time, range_min, range_max, map_size):
+    """
+    :return: Like get_head_xz_pos_heat_map, but for the wall viewpoints.
+    """
+    counts = user.getHeadViewpointHeatMap(start_time, end_time, range_min, range_max, map_size)
+    return np.frombuffer(counts, dtype=np.float32).reshape(map_size[1], map_size[0])
+
+
+def simplify_path(pts, tolerance, mode="rdp"):
+    """
+    Simplifies a 2D path, e.g. a head trajectory before drawing it.
+    :param pts: n x 2 array of points
+    :param tolerance: Maximum distance from the simplified path ("rdp") or minimum triangle area ("vw").
+    :param mode: "rdp" (Ramer-Douglas-Peucker) or "vw" (Visvalingam-Whyatt)
+    :return: Indexes of the points to keep.
+    """
+    pts = np.ascontiguousarray(pts, dtype=np.float32)
+    return np.frombuffer(plots.simplifyPath(pts, tolerance, mode), dtype=np.int32)
 
 
 class Session(object):
@@ -79,15 +228,33 @@ class Session(object):
         self.video_start_time = time.mktime(time_struct) + video_time_offset
 
 
-    def load_from_db(self):
-        self.start_time = execute_qry(
-                "SELECT min(time) FROM head WHERE "+self.__get_level_select()+";", True)[0][0]
-        self.duration = execute_qry(
-                "SELECT max(time) FROM head WHERE "+self.__get_level_select()+";", True)[0][0] - self.start_time
+    def load_from_db(self, use_cache=True):
+        """
+        :param use_cache: Load the user data from the session cache file if it is up to date and (re-)write the
+            cache file otherwise.
+        """
+        self.start_time, self.duration = execute_qry(
+                "SELECT start_time, duration FROM session_info WHERE session=? AND level=?;", True,
+                self.__get_level_params())[0]
+
+        cache_filename = get_cache_filename(self.session_num, self.level_num)
+        session_info = {
+            "start_time": self.start_time,
+            "duration": self.duration,
+            "num_users": self.num_users,
+            "user_pitch_offsets": self.user_pitch_offsets
+        }
+        users_data = None
+        if use_cache:
+            users_data = session_cache.read(cache_filename, session_info)
+        if users_data is None:
+            users_data = [self.__read_user_data(userid) for userid in range(0, self.num_users)]
+            if use_cache:
+                session_cache.write(cache_filename, session_info, users_data)
 
         self.__users = []
         for userid in range(0, self.num_users):
-            self.__users.append(self.__create_user(userid))
+            self.__users.append(self.__create_user(userid, users_data[userid]))
 
     def get_video_time_offset(self):
         return self.start_time - self.video_start_time
@@ -96,59 +263,52 @@ class Session(object):
     def users(self):
         return self.__users
 
-    def __create_user(self, userid):
-        user = plots.User(userid, self.duration)
-        pitch_offset = self.user_pitch_offsets[userid]
-
-        head_data_list = execute_qry("SELECT user, x, y, z, pitch, yaw, roll, time, x_sum, y_sum, z_sum "
-                          "FROM head WHERE user = " + str(userid) + " AND " + self.__get_level_select() +
-                          " GROUP BY time ORDER BY time;", True)
-        for head_list in head_data_list:
-            head_data = self.__head_data_from_list(head_list, pitch_offset)
-            user.addHeadData(head_data)
-
-        touch_data_list = execute_qry("SELECT user, x, y, time, duration "
-                                     "FROM touch WHERE user = " + str(userid) + " AND " + self.__get_level_select() +
-                                     " GROUP BY time ORDER BY time;", True)
-        for touch_list in touch_data_list:
-            touch = self.__touch_data_from_list(self, touch_list)
-            user.addTouch(touch)
+    def correct_head_data(self, userid, posns, rots):
+        """
+        Applies the position correction and the pitch offset of a user to head data as read from the csv file.
+        :return: Corrected copies of posns and rots as float32 arrays.
+        """
+        posns = np.array(posns, dtype=np.float32)
+        posns[:, 1] += head_y_offset
+        rots = np.array(rots, dtype=np.float32)
+        rots[:, 1] += self.user_pitch_offsets[userid]
+        return posns, rots
+
+    def __read_user_data(self, userid):
+        head_data = read_qry_array("SELECT x, y, z, pitch, yaw, roll, time, x_sum, y_sum, z_sum, "
+                "view_x, view_y FROM head WHERE session=? AND level=? AND user=? GROUP BY time ORDER BY time;",
+                12, self.__get_level_params() + (userid,))
+        posns, rots = self.correct_head_data(userid, head_data[:, 0:3], head_data[:, 3:6])
+
+        touch_data = read_qry_array("SELECT x, y, time, duration "
+                "FROM touch WHERE session=? AND level=? AND user=? GROUP BY time ORDER BY time;",
+                4, self.__get_level_params() + (userid,))
+
+        return session_cache.to_user_data(
+                times=head_data[:, 6],
+                posns=posns,
+                rots=rots,
+                pos_prefix_sums=head_data[:, 7:10],
+                viewpts=head_data[:, 10:12],
+                touch_times=touch_data[:, 2] - self.start_time,
+                touch_posns=touch_data[:, 0:2],
+                touch_durations=touch_data[:, 3])
+
+    def __create_user(self, userid, user_data):
+        # The user keeps references to the arrays, so memory-mapped cache data isn't copied.
+        user = plots.User(userid, self.start_time, self.duration)
+        user.setHeadData(user_data["times"], user_data["posns"], user_data["rots"], user_data["pos_prefix_sums"],
+                user_data["viewpts"])
+        user.setTouches(user_data["touch_times"], user_data["touch_posns"], user_data["touch_durations"])
         return user
 
-    def __head_data_from_list(self, head_list, pitch_offset):
-
-        def calc_wall_viewpoint(head_data):
-            yaw_quat = pyglm.quat.fromAxisAngle((0, 1, 0), head_data.rot[0])
-            pitch_quat = pyglm.quat.fromAxisAngle((1, 0, 0), head_data.rot[1])
-            roll_quat = pyglm.quat.fromAxisAngle((0, 0, 1), head_data.rot[2])
-            q = yaw_quat * pitch_quat * roll_quat
-            head_dir = q * pyglm.vec3(0, 0, 1)
-
-            viewpt3d = line_plane_intersect(head_data.pos, head_dir, (0, 0, 0), (0, 0, 1))
-            if viewpt3d is not None:
-                head_data.setWallViewpoint(avg.Point2D(viewpt3d.x, viewpt3d.y))
-            else:
-                head_data.setWallViewpoint(avg.Point2D(0, 0))
-
-        userid = head_list[0]
-        pos = head_list[1], head_list[2]-0.2, head_list[3]
-        rot = head_list[4], head_list[5] + pitch_offset, head_list[6]
-        timestamp = head_list[7]
-
-        head_data = plots.HeadData(userid, pos, rot, timestamp)
-        head_data.posPrefixSum = head_list[8], head_list[9], head_list[10]
-        calc_wall_viewpoint(head_data)
-        return head_data
-
-    def __touch_data_from_list(self, session, touch_list):
-        userid = touch_list[0]
-        pos = avg.Point2D(touch_list[1], touch_list[2])
-        timestamp = touch_list[3] - session.start_time
-        duration = touch_list[4]
-        return plots.Touch(userid, pos, timestamp, duration)
-
-    def __get_level_select(self):
-        return "session=" + str(self.session_num) + " AND level=" + str(self.level_num)
+    def __get_level_params(self):
+        return self.session_num, self.level_num
+
+
+def get_cache_filename(session_num, level_num):
+    return "{}.session{}-{}.cache".format(DB_FILENAME, session_num, level_num)
+
 
 def create_session(session, level):
     data_dir = "%s/StudyData/Session%03d/" % (os.getcwd(), session)
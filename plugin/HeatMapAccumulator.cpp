@@ -0,0 +1,109 @@
+// GIAnT Group Interaction Analysis Toolkit
+// Copyright (C) 2017 Interactive Media Lab Dresden
+// 
+// This program is free software: you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation, either version 3 of the License, or
+// (at your option) any later version.
+// 
+// This program is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+// 
+// You should have received a copy of the GNU General Public License
+// along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+#include "HeatMapAccumulator.h"
+
+#include <base/ScopeTimer.h>
+
+#include <algorithm>
+#include <math.h>
+
+using namespace std;
+using namespace avg;
+
+HeatMapAccumulator::HeatMapAccumulator(const glm::vec2& rangeMin, const glm::vec2& rangeMax,
+        const glm::ivec2& mapSize)
+    : m_RangeMin(rangeMin),
+      m_RangeMax(rangeMax),
+      m_MapSize(mapSize),
+      m_NumCells(mapSize.x*mapSize.y),
+      m_CumCounts(m_NumCells, 0)
+{
+}
+
+bool HeatMapAccumulator::hasParams(const glm::vec2& rangeMin, const glm::vec2& rangeMax,
+        const glm::ivec2& mapSize) const
+{
+    return rangeMin == m_RangeMin && rangeMax == m_RangeMax && mapSize == m_MapSize;
+}
+
+int HeatMapAccumulator::getNumSamples() const
+{
+    return int(m_SampleCells.size());
+}
+
+void HeatMapAccumulator::addPos(const glm::vec2& pos)
+{
+    m_SampleCells.push_back(posToCell(pos));
+    if (m_SampleCells.size() % BLOCK_SIZE == 0) {
+        // Append the cumulative grid for the samples so far.
+        // insert() can't take a range of the vector itself, since resizing invalidates the source iterators.
+        size_t oldSize = m_CumCounts.size();
+        m_CumCounts.resize(oldSize + m_NumCells);
+        copy(m_CumCounts.begin() + oldSize - m_NumCells, m_CumCounts.begin() + oldSize,
+                m_CumCounts.begin() + oldSize);
+        int* pCounts = &m_CumCounts[oldSize];
+        for (auto it = m_SampleCells.end() - BLOCK_SIZE; it != m_SampleCells.end(); ++it) {
+            if (*it != -1) {
+                pCounts[*it]++;
+            }
+        }
+    }
+}
+
+static ProfilingZoneID GetCountsProfilingZone("HeatMapAccumulator::getCounts");
+
+void HeatMapAccumulator::getCounts(int start_i, int end_i, vector<float>& counts) const
+{
+    ScopeTimer timer(GetCountsProfilingZone);
+    counts.assign(m_NumCells, 0.f);
+    // Full blocks between start_i and end_i.
+    int startBlock = (start_i + BLOCK_SIZE - 1) / BLOCK_SIZE;
+    int endBlock = end_i / BLOCK_SIZE;
+    if (startBlock < endBlock) {
+        const int* pStartCounts = &m_CumCounts[startBlock*m_NumCells];
+        const int* pEndCounts = &m_CumCounts[endBlock*m_NumCells];
+        for (int cell=0; cell<m_NumCells; ++cell) {
+            counts[cell] = float(pEndCounts[cell] - pStartCounts[cell]);
+        }
+        // Partial blocks at the ends.
+        addSampleCounts(start_i, startBlock*BLOCK_SIZE, counts);
+        addSampleCounts(endBlock*BLOCK_SIZE, end_i, counts);
+    } else {
+        addSampleCounts(start_i, end_i, counts);
+    }
+}
+
+void HeatMapAccumulator::addSampleCounts(int start_i, int end_i, vector<float>& counts) const
+{
+    for (int i=start_i; i<end_i; ++i) {
+        if (m_SampleCells[i] != -1) {
+            counts[m_SampleCells[i]]++;
+        }
+    }
+}
+
+int HeatMapAccumulator::posToCell(const glm::vec2& pos) const
+{
+    glm::vec2 cellPos = (pos - m_RangeMin) / (m_RangeMax - m_RangeMin) * glm::vec2(m_MapSize);
+    int x = int(floor(cellPos.x));
+    int y = int(floor(cellPos.y));
+    if (x < 0 || y < 0 || x >= m_MapSize.x || y >= m_MapSize.y) {
+        return -1;
+    }
+    return y*m_MapSize.x + x;
+}
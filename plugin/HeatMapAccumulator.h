@@ -0,0 +1,60 @@
+// GIAnT Group Interaction Analysis Toolkit
+// Copyright (C) 2017 Interactive Media Lab Dresden
+// 
+// This program is free software: you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation, either version 3 of the License, or
+// (at your option) any later version.
+// 
+// This program is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+// 
+// You should have received a copy of the GNU General Public License
+// along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+#ifndef _HeatMapAccumulator_H_
+#define _HeatMapAccumulator_H_
+
+#include <api.h>
+
+#include <base/GLMHelper.h>
+#include <vector>
+
+// Counts positions in a grid of mapSize cells that covers [rangeMin, rangeMax) - the same binning HeatMapNode
+// does - so the grid for an arbitrary range of samples can be calculated without touching most of the samples.
+// After every BLOCK_SIZE samples, the cumulative grid of all samples so far is stored. The grid of
+// samples [start_i, end_i) is then the difference of two cumulative grids plus the samples in the partial
+// blocks at the ends.
+class HeatMapAccumulator
+{
+public:
+    static const int BLOCK_SIZE = 256;
+
+    HeatMapAccumulator(const glm::vec2& rangeMin, const glm::vec2& rangeMax, const glm::ivec2& mapSize);
+
+    bool hasParams(const glm::vec2& rangeMin, const glm::vec2& rangeMax, const glm::ivec2& mapSize) const;
+    int getNumSamples() const;
+    // Samples must be added in order.
+    void addPos(const glm::vec2& pos);
+    // Number of samples in [start_i, end_i) per cell, row by row.
+    void getCounts(int start_i, int end_i, std::vector<float>& counts) const;
+
+private:
+    int posToCell(const glm::vec2& pos) const;
+    void addSampleCounts(int start_i, int end_i, std::vector<float>& counts) const;
+
+    glm::vec2 m_RangeMin;
+    glm::vec2 m_RangeMax;
+    glm::ivec2 m_MapSize;
+    int m_NumCells;
+
+    // Cell index of every sample, -1 if the sample is outside the grid.
+    std::vector<int> m_SampleCells;
+    // Cumulative grids: Cells [k*m_NumCells, (k+1)*m_NumCells) count the samples [0, k*BLOCK_SIZE).
+    std::vector<int> m_CumCounts;
+};
+
+#endif
@@ -16,58 +16,137 @@
 
 #include "Path.h"
 
+#include <algorithm>
 #include <cmath>
+#include <queue>
 
 using namespace std;
 
-const std::pair<int, double> findMaximumDistance(const vector<glm::vec2>& pts)
+// Distance of pt from the line through pt1 and pt2 (or from pt1 if pt1 == pt2).
+static float calcLineDist(const glm::vec2& pt, const glm::vec2& pt1, const glm::vec2& pt2)
 {
-    glm::vec2 firstpoint = pts[0];
-    glm::vec2 lastpoint = pts[pts.size()-1];
-    int index = 0;       // index to be returned
-    double maxDist = -1; // the Maximum distance to be returned
+    glm::vec2 lineDir = pt2 - pt1;
+    glm::vec2 relPt = pt - pt1;
+    float lineLength = glm::length(lineDir);
+    if (lineLength == 0) {
+        return glm::length(relPt);
+    }
+    return fabs(lineDir.x*relPt.y - lineDir.y*relPt.x) / lineLength;
+}
+
+static float calcTriangleArea(const glm::vec2& pt1, const glm::vec2& pt2, const glm::vec2& pt3)
+{
+    return fabs((pt2.x-pt1.x)*(pt3.y-pt1.y) - (pt3.x-pt1.x)*(pt2.y-pt1.y)) / 2;
+}
 
-    glm::vec2 p = lastpoint - firstpoint;
-    for (int i=1; i<pts.size()-1; i++) {
-        glm::vec2 pp = pts[i] - firstpoint;
-        float dist = std::abs(glm::dot(pp, p)) / glm::length(p);   // point-to-line distance
-        if (dist > maxDist) {
-            maxDist = dist;
-            index = i;
+static void keepFlagsToIndexes(const vector<char>& keep, vector<int>& keptIndexes)
+{
+    keptIndexes.clear();
+    for (int i=0; i<int(keep.size()); ++i) {
+        if (keep[i]) {
+            keptIndexes.push_back(i);
         }
     }
-    return std::make_pair(index, maxDist);
 }
 
-
-// Implements Ramer-Douglas-Peucker-Algorithm for path simplication.
-// From https://github.com/Yongjiao/Ramer-Douglas-Peucker-Algorithm/blob/master/simplifyPath.cpp
-// Possibly faster version at https://www.namekdev.net/2014/06/iterative-version-of-ramer-douglas-peucker-line-simplification-algorithm/
-vector<glm::vec2> simplifyPath(vector<glm::vec2>& pts, double epsilon)
+// Iterative version: The segments still to be checked are kept on a stack of index pairs, so no points are copied.
+void simplifyPathRDP(int numPts, const glm::vec2* pPts, float epsilon, vector<int>& keptIndexes)
 {
-    if (pts.size()<3) {
-        return pts;
+    if (numPts < 3) {
+        keptIndexes.clear();
+        for (int i=0; i<numPts; ++i) {
+            keptIndexes.push_back(i);
+        }
+        return;
     }
-    std::pair<int, double> maxDistance = findMaximumDistance(pts);
-    if (maxDistance.second >= epsilon) {
-        int index = maxDistance.first;
-        vector<glm::vec2>::iterator it=pts.begin();
-        vector<glm::vec2> path1(pts.begin(), it+index+1); // new path l1 from 0 to index
-        vector<glm::vec2> path2(it+index, pts.end());     // new path l2 from index to last
+    vector<char> keep(numPts, 0);
+    keep[0] = 1;
+    keep[numPts-1] = 1;
+    vector<pair<int, int> > segments;
+    segments.push_back(make_pair(0, numPts-1));
+    while (!segments.empty()) {
+        int first = segments.back().first;
+        int last = segments.back().second;
+        segments.pop_back();
 
-        vector<glm::vec2> r1 = simplifyPath(path1, epsilon);
-        vector<glm::vec2> r2 = simplifyPath(path2, epsilon);
+        int maxIndex = -1;
+        float maxDist = epsilon;
+        for (int i=first+1; i<last; ++i) {
+            float dist = calcLineDist(pPts[i], pPts[first], pPts[last]);
+            if (dist > maxDist) {
+                maxDist = dist;
+                maxIndex = i;
+            }
+        }
+        if (maxIndex != -1) {
+            keep[maxIndex] = 1;
+            segments.push_back(make_pair(first, maxIndex));
+            segments.push_back(make_pair(maxIndex, last));
+        }
+    }
+    keepFlagsToIndexes(keep, keptIndexes);
+}
 
-        //Concat simplified path1 and path2 together
-        vector<glm::vec2> rs(r1);
-        rs.pop_back();
-        rs.insert(rs.end(), r2.begin(), r2.end());
-        return rs;
+void simplifyPathVW(int numPts, const glm::vec2* pPts, float minArea, vector<int>& keptIndexes)
+{
+    vector<char> keep(numPts, 1);
+    if (numPts < 3) {
+        keepFlagsToIndexes(keep, keptIndexes);
+        return;
+    }
+    // Doubly linked list of the remaining points and a min-heap of (area, index). Heap entries become stale when
+    // the area of a point changes; they are detected by comparing with the current area.
+    vector<int> prev(numPts);
+    vector<int> next(numPts);
+    vector<float> areas(numPts);
+    typedef pair<float, int> AreaEntry;
+    vector<AreaEntry> heapEntries;
+    heapEntries.reserve(numPts);
+    for (int i=1; i<numPts-1; ++i) {
+        prev[i] = i-1;
+        next[i] = i+1;
+        areas[i] = calcTriangleArea(pPts[i-1], pPts[i], pPts[i+1]);
+        heapEntries.push_back(AreaEntry(areas[i], i));
     }
-    else { // base case 2, all points between are to be removed.
-        vector<glm::vec2> r(1, pts[0]);
-        r.push_back(pts[pts.size()-1]);
-        return r;
-    }    
+    priority_queue<AreaEntry, vector<AreaEntry>, greater<AreaEntry> > heap(greater<AreaEntry>(), heapEntries);
+
+    while (!heap.empty()) {
+        AreaEntry entry = heap.top();
+        heap.pop();
+        int i = entry.second;
+        if (!keep[i] || entry.first != areas[i]) {
+            continue;
+        }
+        if (entry.first >= minArea) {
+            break;
+        }
+        keep[i] = 0;
+        int p = prev[i];
+        int n = next[i];
+        next[p] = n;
+        prev[n] = p;
+        // The area of a neighbour never becomes smaller than the area of the removed point, so the points are
+        // removed in order of increasing area.
+        if (p != 0) {
+            areas[p] = max(entry.first, calcTriangleArea(pPts[prev[p]], pPts[p], pPts[n]));
+            heap.push(AreaEntry(areas[p], p));
+        }
+        if (n != numPts-1) {
+            areas[n] = max(entry.first, calcTriangleArea(pPts[p], pPts[n], pPts[next[n]]));
+            heap.push(AreaEntry(areas[n], n));
+        }
+    }
+    keepFlagsToIndexes(keep, keptIndexes);
 }
 
+vector<glm::vec2> simplifyPath(const vector<glm::vec2>& pts, double epsilon)
+{
+    vector<int> keptIndexes;
+    simplifyPathRDP(int(pts.size()), pts.data(), float(epsilon), keptIndexes);
+    vector<glm::vec2> simplifiedPts;
+    simplifiedPts.reserve(keptIndexes.size());
+    for (int i: keptIndexes) {
+        simplifiedPts.push_back(pts[i]);
+    }
+    return simplifiedPts;
+}
@@ -14,6 +14,7 @@
 // You should have received a copy of the GNU General Public License
 // along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+
 #ifndef _Path_H_
 #define _Path_H_
 
@@ -22,9 +23,16 @@
 #include <base/GLMHelper.h>
 #include <vector>
 
-std::vector<glm::vec2> simplifyPath(std::vector<glm::vec2>& pts, double epsilon);
+// Path simplification algorithms. They return the indexes of the points to keep (in ascending order, always
+// including the first and the last point) instead of copying the points.
 
-#endif
+// Ramer-Douglas-Peucker: Keeps the points that are further than epsilon from the simplified path.
+void simplifyPathRDP(int numPts, const glm::vec2* pPts, float epsilon, std::vector<int>& keptIndexes);
 
+// Visvalingam-Whyatt: Repeatedly removes the point that forms the smallest triangle with its neighbours until
+// all remaining triangles have an area of at least minArea.
+void simplifyPathVW(int numPts, const glm::vec2* pPts, float minArea, std::vector<int>& keptIndexes);
 
+std::vector<glm::vec2> simplifyPath(const std::vector<glm::vec2>& pts, double epsilon);
 
+#endif
@@ -56,6 +56,7 @@ ScatterPlotNode::ScatterPlotNode(const ArgList& args, const string& sPublisherNa
 {
     args.setMembers(this);
     m_ViewportExtent = m_ViewportRangeMax - m_ViewportRangeMin;
+    m_bDataChanged = true;
 }
 
 ScatterPlotNode::~ScatterPlotNode()
@@ -84,9 +85,10 @@ void ScatterPlotNode::preRender(const VertexArrayPtr& pVA, bool bIsParentActive,
     AreaNode::preRender(pVA, bIsParentActive, parentEffectiveOpacity);
 
     if (m_bDataChanged) {
-        BitmapPtr pBmp = createPlotBmp();
-
-        GLContextManager::get()->scheduleTexUpload(m_pTex, pBmp);
+        if (!m_pBmp) {
+            initPlotBmp();
+        }
+        GLContextManager::get()->scheduleTexUpload(m_pTex, m_pBmp);
         scheduleFXRender();
         m_bDataChanged = false;
     }
@@ -103,24 +105,68 @@ void ScatterPlotNode::render(GLContext* pContext, const glm::mat4& transform)
 
 void ScatterPlotNode::setPosns(const std::vector<glm::vec2>& posns)
 {
-    m_Posns = posns;
+    setPosns(int(posns.size()), posns.data());
+}
+
+static ProfilingZoneID SetPosnsProfilingZone("ScatterPlotNode::setPosns");
+
+void ScatterPlotNode::setPosns(int numPosns, const glm::vec2* pPosns)
+{
+    ScopeTimer timer(SetPosnsProfilingZone);
+    initPlotBmp();
+    changeHitCounts(numPosns, pPosns, 1);
     m_bDataChanged = true;
 }
 
-BitmapPtr ScatterPlotNode::createPlotBmp()
+void ScatterPlotNode::addPosns(int numPosns, const glm::vec2* pPosns)
 {
-    BitmapPtr pBmp(new Bitmap(getSize(), R8G8B8A8));
-    FilterFill<Pixel32>(Pixel32(0,0,0,0)).applyInPlace(pBmp);
-
-    for (auto pos: m_Posns) {
-        glm::vec2 posInBmp = posToBmpPixel(pos);
-        pBmp->setPixel(posInBmp, Pixel32(m_Color));
-        pBmp->setPixel(posInBmp + glm::vec2(1,0), Pixel32(m_Color));
-        pBmp->setPixel(posInBmp + glm::vec2(0,1), Pixel32(m_Color));
-        pBmp->setPixel(posInBmp + glm::vec2(1,1), Pixel32(m_Color));
+    if (!m_pBmp) {
+        initPlotBmp();
     }
+    changeHitCounts(numPosns, pPosns, 1);
+}
 
-    return pBmp;
+void ScatterPlotNode::removePosns(int numPosns, const glm::vec2* pPosns)
+{
+    if (!m_pBmp) {
+        throw Exception(AVG_ERR_UNSUPPORTED, "ScatterPlotNode::removePosns: No positions added.");
+    }
+    changeHitCounts(numPosns, pPosns, -1);
+}
+
+// Creates the plot bitmap if necessary and clears it.
+void ScatterPlotNode::initPlotBmp()
+{
+    if (!m_pBmp) {
+        m_pBmp = BitmapPtr(new Bitmap(getSize(), R8G8B8A8));
+        m_BmpSize = m_pBmp->getSize();
+    }
+    FilterFill<Pixel32>(Pixel32(0,0,0,0)).applyInPlace(m_pBmp);
+    m_HitCounts.assign(m_BmpSize.x*m_BmpSize.y, 0);
+}
+
+// Every position covers 2x2 pixels. Pixels are only written (and the texture only uploaded) when they change
+// between empty and covered.
+void ScatterPlotNode::changeHitCounts(int numPosns, const glm::vec2* pPosns, int delta)
+{
+    Pixel32 color(m_Color);
+    for (int i=0; i<numPosns; ++i) {
+        glm::vec2 posInBmp = posToBmpPixel(pPosns[i]);
+        for (int y=int(posInBmp.y); y<int(posInBmp.y)+2; ++y) {
+            for (int x=int(posInBmp.x); x<int(posInBmp.x)+2; ++x) {
+                if (x < 0 || y < 0 || x >= m_BmpSize.x || y >= m_BmpSize.y) {
+                    continue;
+                }
+                int& hitCount = m_HitCounts[y*m_BmpSize.x + x];
+                bool bWasCovered = hitCount > 0;
+                hitCount = max(0, hitCount + delta);
+                if ((hitCount > 0) != bWasCovered) {
+                    m_pBmp->setPixel(glm::ivec2(x, y), bWasCovered ? Pixel32(0,0,0,0) : color);
+                    m_bDataChanged = true;
+                }
+            }
+        }
+    }
 }
 
 glm::vec2 ScatterPlotNode::posToBmpPixel(const glm::vec2& pos)
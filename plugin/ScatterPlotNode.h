@@ -49,9 +49,15 @@ public:
 
     // node external methods
     void setPosns(const std::vector<glm::vec2>& posns);
+    void setPosns(int numPosns, const glm::vec2* pPosns);
+    // Incremental updates: Only the pixels of the given positions change. Removed positions must have been
+    // added before.
+    void addPosns(int numPosns, const glm::vec2* pPosns);
+    void removePosns(int numPosns, const glm::vec2* pPosns);
 
 private:
-    avg::BitmapPtr createPlotBmp();
+    void initPlotBmp();
+    void changeHitCounts(int numPosns, const glm::vec2* pPosns, int delta);
     glm::vec2 posToBmpPixel(const glm::vec2& pos);
 
     avg::MCTexturePtr m_pTex;
@@ -60,7 +66,12 @@ private:
     glm::vec2 m_ViewportRangeMin;
     glm::vec2 m_ViewportRangeMax;
     glm::vec2 m_ViewportExtent;
-    std::vector<glm::vec2> m_Posns;
+
+    // The plot bitmap is kept between updates. It has the size of the node at the first update. m_HitCounts
+    // contains the number of positions that cover each pixel; a pixel is drawn if its count is > 0.
+    avg::BitmapPtr m_pBmp;
+    glm::ivec2 m_BmpSize;
+    std::vector<int> m_HitCounts;
 
     bool m_bDataChanged;
 };
@@ -18,7 +18,31 @@
 
 #include "Path.h"
 
+#include <base/Exception.h>
+#include <base/ScopeTimer.h>
+#include <base/StringHelper.h>
+
+#include <glm/gtc/quaternion.hpp>
+
+#include <algorithm>
+
 using namespace std;
+using namespace avg;
+
+// Intersects the gaze ray of a head with the wall plane (z=0).
+static glm::vec2 calcWallViewpoint(const glm::vec3& pos, const glm::vec3& rot)
+{
+    glm::quat yawQuat = glm::angleAxis(rot.x, glm::vec3(0, 1, 0));
+    glm::quat pitchQuat = glm::angleAxis(rot.y, glm::vec3(1, 0, 0));
+    glm::quat rollQuat = glm::angleAxis(rot.z, glm::vec3(0, 0, 1));
+    glm::vec3 headDir = yawQuat * pitchQuat * rollQuat * glm::vec3(0, 0, 1);
+    if (fabs(headDir.z) > 0.000000001) {
+        glm::vec3 viewpt = pos + headDir * (-pos.z / headDir.z);
+        return glm::vec2(viewpt.x, viewpt.y);
+    } else {
+        return glm::vec2(0, 0);
+    }
+}
 
 Touch::Touch(int userid, const glm::vec2& pos, float time, float duration)
     : m_UserID(userid),
@@ -44,10 +68,13 @@ float Touch::getDuration() const
 }
 
 
-User::User(int userid, float duration)
+User::User(int userid, double startTime, float duration)
     : m_UserID(userid),
-      m_Duration(duration)
+      m_StartTime(startTime),
+      m_Duration(duration),
+      m_PyramidNumSamples(0)
 {
+    useOwnHeadData();
 }
 
 User::~User()
@@ -56,12 +83,86 @@ User::~User()
 
 void User::addHeadData(const HeadData& head)
 {
-    m_HeadData.push_back(head);
+    copyHeadData();
+    m_Times.push_back(head.getTime());
+    m_Posns.push_back(head.getPos());
+    m_Rots.push_back(head.getRot());
+    m_PosPrefixSums.push_back(head.getPosPrefixSum());
+    m_WallViewpoints.push_back(head.getWallViewpoint());
+    useOwnHeadData();
+    appendCumulativeStats(m_NumSamples-1);
+}
+
+static ProfilingZoneID SetHeadDataProfilingZone("User::setHeadData");
+
+// If pWallViewpoints is NULL, the viewpoints are calculated from the head positions and rotations.
+void User::setHeadData(int numSamples, const double* pTimes, const glm::vec3* pPosns, const glm::vec3* pRots,
+        const glm::vec3* pPosPrefixSums, const glm::vec2* pWallViewpoints, const boost::shared_ptr<void>& pDataOwner)
+{
+    ScopeTimer timer(SetHeadDataProfilingZone);
+    m_Times.clear();
+    m_Posns.clear();
+    m_Rots.clear();
+    m_PosPrefixSums.clear();
+    m_WallViewpoints.clear();
+
+    m_NumSamples = numSamples;
+    m_pTimes = pTimes;
+    m_pPosns = pPosns;
+    m_pRots = pRots;
+    m_pPosPrefixSums = pPosPrefixSums;
+    m_pDataOwner = pDataOwner;
+    if (pWallViewpoints) {
+        m_pWallViewpoints = pWallViewpoints;
+    } else {
+        m_WallViewpoints.reserve(numSamples);
+        for (int i=0; i<numSamples; ++i) {
+            m_WallViewpoints.push_back(calcWallViewpoint(pPosns[i], pRots[i]));
+        }
+        m_pWallViewpoints = m_WallViewpoints.data();
+    }
+
+    m_CumDist.clear();
+    m_CumZ.clear();
+    m_CumDist.reserve(numSamples);
+    m_CumZ.reserve(numSamples+1);
+    for (int i=0; i<numSamples; ++i) {
+        appendCumulativeStats(i);
+    }
+    // The pyramid is built by the first getHeadPosExtents call.
+    m_MinPyramid.clear();
+    m_MaxPyramid.clear();
+    m_PyramidNumSamples = 0;
+    m_pXZPosAccumulator.reset();
+    m_pViewpointAccumulator.reset();
 }
 
 void User::addTouch(const Touch& touch)
 {
-    m_Touches.push_back(touch);
+    int i = int(upper_bound(m_TouchTimes.begin(), m_TouchTimes.end(), touch.getTime()) - m_TouchTimes.begin());
+    m_TouchTimes.insert(m_TouchTimes.begin() + i, touch.getTime());
+    m_TouchPosns.insert(m_TouchPosns.begin() + i, touch.getPos());
+    m_TouchDurations.insert(m_TouchDurations.begin() + i, touch.getDuration());
+}
+
+void User::setTouches(int numTouches, const float* pTimes, const glm::vec2* pPosns, const float* pDurations)
+{
+    vector<int> order(numTouches);
+    for (int i=0; i<numTouches; ++i) {
+        order[i] = i;
+    }
+    if (!is_sorted(pTimes, pTimes + numTouches)) {
+        stable_sort(order.begin(), order.end(), [pTimes](int i, int j) { return pTimes[i] < pTimes[j]; });
+    }
+
+    m_TouchTimes.resize(numTouches);
+    m_TouchPosns.resize(numTouches);
+    m_TouchDurations.resize(numTouches);
+    for (int i=0; i<numTouches; ++i) {
+        m_TouchTimes[i] = pTimes[order[i]];
+        m_TouchPosns[i] = pPosns[order[i]];
+        m_TouchDurations[i] = pDurations[order[i]];
+    }
 }
 
 int User::getUserID() const
@@ -71,27 +172,91 @@ int User::getUserID() const
 
 const glm::vec3& User::getHeadPos(float time) const
 {
-    int i = timeToIndex(time);
-    return m_HeadData[i].getPos();
+    checkHeadData();
+    return m_pPosns[timeToIndex(time)];
 }
 
 const glm::vec2& User::getWallViewpoint(float time) const
 {
-    int i = timeToIndex(time);
-    return m_HeadData[i].getWallViewpoint();
+    checkHeadData();
+    return m_pWallViewpoints[timeToIndex(time)];
 }
 
 const glm::vec3& User::getHeadRot(float time) const
 {
-    int i = timeToIndex(time);
-    return m_HeadData[i].getRot();
+    checkHeadData();
+    return m_pRots[timeToIndex(time)];
 }
 
 glm::vec3 User::getHeadPosAvg(float time, int smoothness) const
 {
-    int i = timeToIndex(time);
-    glm::vec3 startSum = m_HeadData[fmax(0, i - smoothness/2)].getPosPrefixSum();
-    glm::vec3 endSum = m_HeadData[fmin(m_HeadData.size()-1, i + int((smoothness+1)/2))].getPosPrefixSum();
+    checkHeadData();
+    return getHeadPosAvgAtIndex(timeToIndex(time), smoothness);
+}
+
+static ProfilingZoneID GetHeadPosnsProfilingZone("User::getHeadPosns");
+
+vector<glm::vec3> User::getHeadPosns(float startTime, float timeStep, int numSamples) const
+{
+    ScopeTimer timer(GetHeadPosnsProfilingZone);
+    checkHeadData();
+    vector<glm::vec3> posns;
+    posns.reserve(numSamples);
+    int i = 0;
+    for (int sample=0; sample<numSamples; ++sample) {
+        i = timeToIndex(startTime + sample*timeStep, i);
+        posns.push_back(m_pPosns[i]);
+    }
+    return posns;
+}
+
+static ProfilingZoneID GetHeadPosAvgsProfilingZone("User::getHeadPosAvgs");
+
+vector<glm::vec3> User::getHeadPosAvgs(float startTime, float timeStep, int numSamples, int smoothness) const
+{
+    ScopeTimer timer(GetHeadPosAvgsProfilingZone);
+    checkHeadData();
+    vector<glm::vec3> posns;
+    posns.reserve(numSamples);
+    int i = 0;
+    for (int sample=0; sample<numSamples; ++sample) {
+        // For increasing sample times, the search can start at the previous index.
+        i = timeToIndex(startTime + sample*timeStep, i);
+        posns.push_back(getHeadPosAvgAtIndex(i, smoothness));
+    }
+    return posns;
+}
+
+static ProfilingZoneID GetHeadPosExtentsProfilingZone("User::getHeadPosExtents");
+
+void User::getHeadPosExtents(float startTime, float endTime, int numBuckets, vector<glm::vec3>& mins,
+        vector<glm::vec3>& maxs) const
+{
+    ScopeTimer timer(GetHeadPosExtentsProfilingZone);
+    checkHeadData();
+    if (m_PyramidNumSamples != m_NumSamples) {
+        buildPyramid();
+    }
+    mins.resize(numBuckets);
+    maxs.resize(numBuckets);
+    float bucketDuration = (endTime - startTime) / numBuckets;
+    int end_i = firstIndexAfter(startTime);
+    for (int bucket=0; bucket<numBuckets; ++bucket) {
+        int start_i = end_i;
+        end_i = firstIndexAfter(startTime + (bucket+1)*bucketDuration);
+        if (start_i < end_i) {
+            getHeadPosExtentsAtIndexes(start_i, end_i, mins[bucket], maxs[bucket]);
+        } else {
+            mins[bucket] = m_pPosns[timeToIndex(startTime + bucket*bucketDuration)];
+            maxs[bucket] = mins[bucket];
+        }
+    }
+}
+
+glm::vec3 User::getHeadPosAvgAtIndex(int i, int smoothness) const
+{
+    glm::vec3 startSum = m_pPosPrefixSums[max(0, i - smoothness/2)];
+    glm::vec3 endSum = m_pPosPrefixSums[min(m_NumSamples-1, i + int((smoothness+1)/2))];
     glm::vec3 headPos = glm::vec3(
             (endSum.x - startSum.x) / smoothness,
             (endSum.y - startSum.y) / smoothness,
@@ -101,57 +266,94 @@ glm::vec3 User::getHeadPosAvg(float time, int smoothness) const
 
 float User::getDistTravelled(float startTime, float endTime) const
 {
-    int start_i = timeToIndex(startTime);
-    int end_i = timeToIndex(endTime);
-    vector<glm::vec2> posns;
-    for (int i=start_i; i<end_i; ++i) {
-        const HeadData& head = m_HeadData[i];
-        posns.push_back(glm::vec2(head.getPos().x, head.getPos().z));
+    int start_i = firstIndexAfter(startTime);
+    int end_i = firstIndexAfter(endTime);
+    if (end_i - start_i < 2) {
+        return 0.0f;
     }
-//    vector<glm::vec2> posns = simplifyPath(origPosns, 0.1f);
+    return float(m_CumDist[end_i-1] - m_CumDist[start_i]);
+}
 
-    float dist = 0.0f;
-    glm::vec2 pos = posns[0];
-    glm::vec2 oldPos;
-    for (int i=1; i<posns.size(); ++i) {
-        oldPos = pos;
-        pos = posns[i];
-        dist += glm::distance(pos, oldPos);
+static ProfilingZoneID GetSimplifiedDistProfilingZone("User::getDistTravelled (simplified)");
+
+float User::getDistTravelled(float startTime, float endTime, float epsilon) const
+{
+    ScopeTimer timer(GetSimplifiedDistProfilingZone);
+    vector<glm::vec2> posns = getHeadXZPosns(startTime, endTime);
+    vector<int> keptIndexes;
+    simplifyPathRDP(int(posns.size()), posns.data(), epsilon, keptIndexes);
+    double dist = 0;
+    for (int i=1; i<int(keptIndexes.size()); ++i) {
+        dist += glm::distance(posns[keptIndexes[i]], posns[keptIndexes[i-1]]);
     }
-    return dist;
+    return float(dist);
 }
 
 float User::getAvgDistFromWall(float startTime, float endTime) const
 {
-    int start_i = timeToIndex(startTime);
-    int end_i = timeToIndex(endTime);
-    float sum = 0;
-    for (int i=start_i; i<end_i; ++i) {
-        sum += m_HeadData[i].getPos().z;
+    int start_i = firstIndexAfter(startTime);
+    int end_i = firstIndexAfter(endTime);
+    if (end_i <= start_i) {
+        return 0;
     }
-    return sum/(end_i-start_i);
+    return float((m_CumZ[end_i] - m_CumZ[start_i]) / (end_i-start_i));
 }
 
-
+int User::countTouches(float startTime, float endTime) const
+{
+    int first, last;
+    getTouchIndexRange(startTime, endTime, first, last);
+    return last - first;
+}
 
 vector<Touch> User::getTouches(float startTime, float endTime) const
 {
+    int first, last;
+    getTouchIndexRange(startTime, endTime, first, last);
     vector<Touch> touches;
-    for (auto touch: m_Touches) {
-        if (startTime <= touch.getTime() && touch.getTime() <= endTime) {
-            touches.push_back(touch);
-        }
+    touches.reserve(last - first);
+    for (int i=first; i<last; ++i) {
+        touches.push_back(Touch(m_UserID, m_TouchPosns[i], m_TouchTimes[i], m_TouchDurations[i]));
     }
     return touches;
 }
 
+vector<glm::vec2> User::getTouchPosns(float startTime, float endTime) const
+{
+    int first, last;
+    getTouchIndexRange(startTime, endTime, first, last);
+    return vector<glm::vec2>(m_TouchPosns.begin() + first, m_TouchPosns.begin() + last);
+}
+
+void User::getTouchIndexRange(float startTime, float endTime, int& first, int& last) const
+{
+    first = int(lower_bound(m_TouchTimes.begin(), m_TouchTimes.end(), startTime) - m_TouchTimes.begin());
+    last = int(upper_bound(m_TouchTimes.begin(), m_TouchTimes.end(), endTime) - m_TouchTimes.begin());
+    last = max(first, last);
+}
+
+const float* User::getTouchTimeArray() const
+{
+    return m_TouchTimes.data();
+}
+
+const glm::vec2* User::getTouchPosArray() const
+{
+    return m_TouchPosns.data();
+}
+
+const float* User::getTouchDurationArray() const
+{
+    return m_TouchDurations.data();
+}
+
 vector<glm::vec2> User::getHeadXZPosns(float startTime, float endTime) const
 {
     vector<glm::vec2> posns;
-    int start_i = timeToIndex(startTime);
-    int end_i = timeToIndex(endTime);
+    int start_i = firstIndexAfter(startTime);
+    int end_i = firstIndexAfter(endTime);
     for (int i=start_i; i<end_i; ++i) {
-        const glm::vec3 pos = m_HeadData[i].getPos();
+        const glm::vec3& pos = m_pPosns[i];
         posns.push_back(glm::vec2(pos.x, pos.z));
     }
     return posns;
@@ -160,16 +362,168 @@ vector<glm::vec2> User::getHeadXZPosns(float startTime, float endTime) const
 vector<glm::vec2> User::getHeadViewpoints(float startTime, float endTime) const
 {
     vector<glm::vec2> viewpts;
-    int start_i = timeToIndex(startTime);
-    int end_i = timeToIndex(endTime);
+    int start_i = firstIndexAfter(startTime);
+    int end_i = firstIndexAfter(endTime);
     for (int i=start_i; i<end_i; ++i) {
-        viewpts.push_back(m_HeadData[i].getWallViewpoint());
+        viewpts.push_back(m_pWallViewpoints[i]);
     }
     return viewpts;
 
 }
 
+void User::getHeadXZPosHeatMap(float startTime, float endTime, const glm::vec2& rangeMin,
+        const glm::vec2& rangeMax, const glm::ivec2& mapSize, vector<float>& counts) const
+{
+    updateHeatMapAccumulator(m_pXZPosAccumulator, rangeMin, rangeMax, mapSize, false);
+    m_pXZPosAccumulator->getCounts(firstIndexAfter(startTime), firstIndexAfter(endTime), counts);
+}
+
+void User::getHeadViewpointHeatMap(float startTime, float endTime, const glm::vec2& rangeMin,
+        const glm::vec2& rangeMax, const glm::ivec2& mapSize, vector<float>& counts) const
+{
+    updateHeatMapAccumulator(m_pViewpointAccumulator, rangeMin, rangeMax, mapSize, true);
+    m_pViewpointAccumulator->getCounts(firstIndexAfter(startTime), firstIndexAfter(endTime), counts);
+}
+
+// Returns the index of the last sample at or before time, clamped to the valid index range.
+// The samples don't need to be evenly spaced, so dropped frames don't shift later lookups.
 int User::timeToIndex(float time) const
 {
-    return int(time * m_HeadData.size() / m_Duration);
+    return max(0, firstIndexAfter(time) - 1);
+}
+
+// Same as timeToIndex(time), but only searches from firstIndex on if time isn't before that sample.
+int User::timeToIndex(float time, int firstIndex) const
+{
+    double absTime = m_StartTime + time;
+    if (absTime < m_pTimes[firstIndex]) {
+        // Decreasing times, e.g. a negative time step.
+        firstIndex = 0;
+    }
+    const double* pFound = upper_bound(m_pTimes + firstIndex, m_pTimes + m_NumSamples, absTime);
+    return max(0, int(pFound - m_pTimes) - 1);
+}
+
+// Returns the index of the first sample later than time (m_NumSamples if there is none). Range queries cover
+// the samples in [firstIndexAfter(startTime), firstIndexAfter(endTime)).
+int User::firstIndexAfter(float time) const
+{
+    return int(upper_bound(m_pTimes, m_pTimes + m_NumSamples, m_StartTime + time) - m_pTimes);
+}
+
+void User::checkHeadData() const
+{
+    if (m_NumSamples == 0) {
+        throw Exception(AVG_ERR_OUT_OF_RANGE, "User " + toString(m_UserID) + " has no head data.");
+    }
+}
+
+// Copies external head data into the User's own vectors so it can be modified.
+void User::copyHeadData()
+{
+    if (m_pTimes != m_Times.data()) {
+        m_Times.assign(m_pTimes, m_pTimes + m_NumSamples);
+        m_Posns.assign(m_pPosns, m_pPosns + m_NumSamples);
+        m_Rots.assign(m_pRots, m_pRots + m_NumSamples);
+        m_PosPrefixSums.assign(m_pPosPrefixSums, m_pPosPrefixSums + m_NumSamples);
+        if (m_pWallViewpoints != m_WallViewpoints.data()) {
+            m_WallViewpoints.assign(m_pWallViewpoints, m_pWallViewpoints + m_NumSamples);
+        }
+        m_pDataOwner.reset();
+    }
+}
+
+// Minimum and maximum of the positions [start_i, end_i) in O(log n) using the pyramid.
+void User::getHeadPosExtentsAtIndexes(int start_i, int end_i, glm::vec3& minPos, glm::vec3& maxPos) const
+{
+    minPos = m_pPosns[start_i];
+    maxPos = m_pPosns[start_i];
+    const glm::vec3* pMins = m_pPosns;
+    const glm::vec3* pMaxs = m_pPosns;
+    int level = 0;
+    while (start_i < end_i) {
+        if (start_i & 1) {
+            minPos = glm::min(minPos, pMins[start_i]);
+            maxPos = glm::max(maxPos, pMaxs[start_i]);
+            start_i++;
+        }
+        if (end_i & 1) {
+            end_i--;
+            minPos = glm::min(minPos, pMins[end_i]);
+            maxPos = glm::max(maxPos, pMaxs[end_i]);
+        }
+        start_i /= 2;
+        end_i /= 2;
+        if (start_i < end_i) {
+            pMins = m_MinPyramid[level].data();
+            pMaxs = m_MaxPyramid[level].data();
+            level++;
+        }
+    }
+}
+
+void User::buildPyramid() const
+{
+    m_MinPyramid.clear();
+    m_MaxPyramid.clear();
+    const glm::vec3* pMins = m_pPosns;
+    const glm::vec3* pMaxs = m_pPosns;
+    int size = m_NumSamples;
+    while (size > 1) {
+        int newSize = (size+1)/2;
+        m_MinPyramid.push_back(vector<glm::vec3>(newSize));
+        m_MaxPyramid.push_back(vector<glm::vec3>(newSize));
+        vector<glm::vec3>& mins = m_MinPyramid.back();
+        vector<glm::vec3>& maxs = m_MaxPyramid.back();
+        for (int j=0; j<newSize; ++j) {
+            int last = min(2*j+1, size-1);
+            mins[j] = glm::min(pMins[2*j], pMins[last]);
+            maxs[j] = glm::max(pMaxs[2*j], pMaxs[last]);
+        }
+        pMins = mins.data();
+        pMaxs = maxs.data();
+        size = newSize;
+    }
+    m_PyramidNumSamples = m_NumSamples;
+}
+
+// Extends the running sums by sample i. Must be called for every sample in order.
+void User::appendCumulativeStats(int i)
+{
+    if (i == 0) {
+        m_CumDist.push_back(0.0);
+        m_CumZ.assign(1, 0.0);
+    } else {
+        glm::vec2 pos(m_pPosns[i].x, m_pPosns[i].z);
+        glm::vec2 oldPos(m_pPosns[i-1].x, m_pPosns[i-1].z);
+        m_CumDist.push_back(m_CumDist.back() + glm::distance(pos, oldPos));
+    }
+    m_CumZ.push_back(m_CumZ.back() + m_pPosns[i].z);
+}
+
+// (Re)creates the accumulator if the grid parameters changed and adds the samples it doesn't contain yet.
+void User::updateHeatMapAccumulator(boost::shared_ptr<HeatMapAccumulator>& pAccumulator,
+        const glm::vec2& rangeMin, const glm::vec2& rangeMax, const glm::ivec2& mapSize, bool bViewpoints) const
+{
+    if (!pAccumulator || !pAccumulator->hasParams(rangeMin, rangeMax, mapSize)) {
+        pAccumulator = boost::shared_ptr<HeatMapAccumulator>(
+                new HeatMapAccumulator(rangeMin, rangeMax, mapSize));
+    }
+    for (int i=pAccumulator->getNumSamples(); i<m_NumSamples; ++i) {
+        if (bViewpoints) {
+            pAccumulator->addPos(m_pWallViewpoints[i]);
+        } else {
+            pAccumulator->addPos(glm::vec2(m_pPosns[i].x, m_pPosns[i].z));
+        }
+    }
+}
+
+void User::useOwnHeadData()
+{
+    m_NumSamples = m_Times.size();
+    m_pTimes = m_Times.data();
+    m_pPosns = m_Posns.data();
+    m_pRots = m_Rots.data();
+    m_pPosPrefixSums = m_PosPrefixSums.data();
+    m_pWallViewpoints = m_WallViewpoints.data();
 }
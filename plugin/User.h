@@ -22,6 +22,11 @@
 #include <base/GLMHelper.h>
 
 #include "HeadData.h"
+#include "HeatMapAccumulator.h"
+
+#include <boost/shared_ptr.hpp>
+
+#include <vector>
 
 class Touch
 {
@@ -42,33 +47,109 @@ private:
 class User
 {
 public:
-    User(int userid, float duration);
+    // startTime is the session start; all time parameters below are relative to it.
+    User(int userid, double startTime, float duration);
     virtual ~User();
 
     void addHeadData(const HeadData& head);
+    // The head data arrays aren't copied; pDataOwner keeps them alive as long as the User references them.
+    void setHeadData(int numSamples, const double* pTimes, const glm::vec3* pPosns, const glm::vec3* pRots,
+            const glm::vec3* pPosPrefixSums, const glm::vec2* pWallViewpoints,
+            const boost::shared_ptr<void>& pDataOwner);
     void addTouch(const Touch& touch);
+    void setTouches(int numTouches, const float* pTimes, const glm::vec2* pPosns, const float* pDurations);
 
     int getUserID() const;
     const glm::vec3& getHeadPos(float time) const;
     const glm::vec2& getWallViewpoint(float time) const;
     const glm::vec3& getHeadRot(float time) const;
 
+    // Returns getHeadPos() for numSamples times starting at startTime, timeStep apart.
+    std::vector<glm::vec3> getHeadPosns(float startTime, float timeStep, int numSamples) const;
     glm::vec3 getHeadPosAvg(float time, int smoothness) const;
+    // Returns getHeadPosAvg() for numSamples times starting at startTime, timeStep apart.
+    std::vector<glm::vec3> getHeadPosAvgs(float startTime, float timeStep, int numSamples, int smoothness) const;
+    // Minimum and maximum head position in numBuckets equal time intervals between startTime and endTime.
+    // Empty buckets contain the position at the bucket start.
+    void getHeadPosExtents(float startTime, float endTime, int numBuckets, std::vector<glm::vec3>& mins,
+            std::vector<glm::vec3>& maxs) const;
     float getDistTravelled(float startTime, float endTime) const;
+    // Length of the xz path after Ramer-Douglas-Peucker simplification, which removes tracking jitter.
+    float getDistTravelled(float startTime, float endTime, float epsilon) const;
     float getAvgDistFromWall(float startTime, float endTime) const;
 
+    // Touch queries include touches at startTime and endTime.
+    int countTouches(float startTime, float endTime) const;
     std::vector<Touch> getTouches(float startTime, float endTime) const;
+    std::vector<glm::vec2> getTouchPosns(float startTime, float endTime) const;
+    // Index range [first, last) of the touches between startTime and endTime in the touch arrays below.
+    void getTouchIndexRange(float startTime, float endTime, int& first, int& last) const;
+    const float* getTouchTimeArray() const;
+    const glm::vec2* getTouchPosArray() const;
+    const float* getTouchDurationArray() const;
     std::vector<glm::vec2> getHeadXZPosns(float startTime, float endTime) const;
     std::vector<glm::vec2> getHeadViewpoints(float startTime, float endTime) const;
+    // Heat map grids (see HeatMapAccumulator) of the xz head positions and the wall viewpoints between
+    // startTime and endTime. The accumulators are built on the first call and rebuilt if the grid changes.
+    void getHeadXZPosHeatMap(float startTime, float endTime, const glm::vec2& rangeMin,
+            const glm::vec2& rangeMax, const glm::ivec2& mapSize, std::vector<float>& counts) const;
+    void getHeadViewpointHeatMap(float startTime, float endTime, const glm::vec2& rangeMin,
+            const glm::vec2& rangeMax, const glm::ivec2& mapSize, std::vector<float>& counts) const;
 
 private:
     int timeToIndex(float time) const;
+    int timeToIndex(float time, int firstIndex) const;
+    glm::vec3 getHeadPosAvgAtIndex(int i, int smoothness) const;
+    void getHeadPosExtentsAtIndexes(int start_i, int end_i, glm::vec3& minPos, glm::vec3& maxPos) const;
+    void buildPyramid() const;
+    int firstIndexAfter(float time) const;
+    void checkHeadData() const;
+    void copyHeadData();
+    void useOwnHeadData();
+    void appendCumulativeStats(int i);
+    void updateHeatMapAccumulator(boost::shared_ptr<HeatMapAccumulator>& pAccumulator,
+            const glm::vec2& rangeMin, const glm::vec2& rangeMax, const glm::ivec2& mapSize,
+            bool bViewpoints) const;
 
     int m_UserID;
+    double m_StartTime;
     float m_Duration;
 
-    std::vector<HeadData> m_HeadData;
-    std::vector<Touch> m_Touches;
+    // Head data, one entry per sample, sorted by (absolute) time. Points either to external memory (e.g. a memory-mapped session cache)
+    // or to the vectors below.
+    int m_NumSamples;
+    const double* m_pTimes;
+    const glm::vec3* m_pPosns;
+    const glm::vec3* m_pRots;
+    const glm::vec3* m_pPosPrefixSums;
+    const glm::vec2* m_pWallViewpoints;
+    boost::shared_ptr<void> m_pDataOwner;
+
+    std::vector<double> m_Times;
+    std::vector<glm::vec3> m_Posns;
+    std::vector<glm::vec3> m_Rots;
+    std::vector<glm::vec3> m_PosPrefixSums;
+    std::vector<glm::vec2> m_WallViewpoints;
+
+    // Running sums for the interval statistics: m_CumDist[i] is the xz path length from sample 0 to sample i,
+    // m_CumZ[i] is the sum of the z coordinates of samples 0..i-1.
+    std::vector<double> m_CumDist;
+    std::vector<double> m_CumZ;
+
+    // Min/max pyramid over the head positions: Entry j of level k covers the samples [j*2^(k+1), (j+1)*2^(k+1)).
+    // Built on demand in getHeadPosExtents, since only few callers need it.
+    mutable std::vector<std::vector<glm::vec3> > m_MinPyramid;
+    mutable std::vector<std::vector<glm::vec3> > m_MaxPyramid;
+    mutable int m_PyramidNumSamples;
+
+    // Built on demand and extended when head data is added.
+    mutable boost::shared_ptr<HeatMapAccumulator> m_pXZPosAccumulator;
+    mutable boost::shared_ptr<HeatMapAccumulator> m_pViewpointAccumulator;
+
+    // Touches, sorted by time.
+    std::vector<float> m_TouchTimes;
+    std::vector<glm::vec2> m_TouchPosns;
+    std::vector<float> m_TouchDurations;
 };
 
 #endif
@@ -23,6 +23,7 @@
 #include <player/TypeDefinition.h>
 #include <player/TypeRegistry.h>
 
+#include <algorithm>
 #include <iostream>
 #include <string>
 #include <math.h>
@@ -39,6 +40,7 @@ void VWLineNode::registerType()
             ExportedObject::buildObject<VWLineNode>)
         .addArg(Arg<float>("maxwidth", 1, false, offsetof(VWLineNode, m_MaxWidth)))
         .addArg(Arg<bool>("useopacity", true, false, offsetof(VWLineNode, m_bUseOpacity)))
+        .addArg(Arg<float>("highlighttolerance", 0.5, false, offsetof(VWLineNode, m_HighlightTolerance)))
         ;
     const char* allowedParentNodeNames[] = {"div", "canvas", "avg", 0};
     TypeRegistry::get()->registerType(def, allowedParentNodeNames);
@@ -57,28 +59,42 @@ VWLineNode::~VWLineNode()
 static ProfilingZoneID SetValuesProfilingZone("VWLineNode::setValues");
 
 void VWLineNode::setValues(const vector<glm::vec2>& pts, const vector<float>& dists)
+{
+    if (pts.size() != dists.size()) {
+        throw(Exception(AVG_ERR_INVALID_ARGS, "VWLineNode::setValues: pts and dists must have the same length."));
+    }
+    setValues(int(pts.size()), pts.data(), dists.data());
+}
+
+void VWLineNode::setValues(int numPts, const glm::vec2* pPts, const float* pDists)
 {
     ScopeTimer timer(SetValuesProfilingZone);
-    m_Pts = pts;
+    m_Pts.assign(pPts, pPts + numPts);
+    const vector<glm::vec2>& pts = m_Pts;
     Pixel32 color = getColor();
-    m_VertexCoords.clear();
-    m_Colors.clear();
-    m_Triangles.clear();
+    m_VertexCoords.resize(2*numPts);
+    m_Colors.resize(2*numPts);
+    m_Triangles.resize(2*max(0, numPts-1));
 
-    vector<float> clampedDists;
-    vector<float> widths;
-    for (int i=0; i<pts.size(); ++i) {
-        float dist = max(0.f, min(1.f, dists[i]));
-        clampedDists.push_back(dist);
-        widths.push_back(calcWidth(dist));
+    m_ClampedDists.resize(numPts);
+    m_Widths.resize(numPts);
+    for (int i=0; i<numPts; ++i) {
+        float dist = max(0.f, min(1.f, pDists[i]));
+        m_ClampedDists[i] = dist;
+        m_Widths[i] = calcWidth(dist);
     }
+    const vector<float>& widths = m_Widths;
 
-    float avgWidth = widths[0] + widths[1];
-    for (int i=0; i<pts.size(); ++i) {
-        int vi = m_VertexCoords.size();
+    float avgWidth = 0;
+    for (int i=0; i<min(numPts, 2); ++i) {
+        avgWidth += widths[i];
+    }
+    for (int i=0; i<numPts; ++i) {
+        int vi = 2*i;
 
         glm::vec2 pt = pts[i];
-        float opacity = calcOpacity(clampedDists[i]);
+        Pixel32 vertexColor = color;
+        vertexColor.setA(calcOpacity(m_ClampedDists[i])*255);
 
         bool bStartEnd = false;
         if (i >= WIDTH_WINDOW/2) {
@@ -86,7 +102,7 @@ void VWLineNode::setValues(const vector<glm::vec2>& pts, const vector<float>& di
         } else {
             bStartEnd = true;
         }
-        if (i < pts.size() - WIDTH_WINDOW/2) {
+        if (i < numPts - WIDTH_WINDOW/2) {
             avgWidth += widths[i+WIDTH_WINDOW/2];
         } else {
             bStartEnd = true;
@@ -102,13 +118,14 @@ void VWLineNode::setValues(const vector<glm::vec2>& pts, const vector<float>& di
         glm::vec2 offset(0, visWidth);
         glm::vec2 pt_t = pt - offset;
         glm::vec2 pt_b = pt + offset;
-        m_VertexCoords.push_back(pt_t);
-        m_VertexCoords.push_back(pt_b);
-        appendColors(2, color, opacity);
+        m_VertexCoords[vi] = pt_t;
+        m_VertexCoords[vi+1] = pt_b;
+        m_Colors[vi] = vertexColor;
+        m_Colors[vi+1] = vertexColor;
 
         if (i>0) {
-            m_Triangles.push_back(glm::ivec3(vi-2, vi, vi-1));
-            m_Triangles.push_back(glm::ivec3(vi-1, vi, vi+1));
+            m_Triangles[2*i-2] = glm::ivec3(vi-2, vi, vi-1);
+            m_Triangles[2*i-1] = glm::ivec3(vi-1, vi, vi+1);
         }
     }
 
@@ -118,25 +135,87 @@ void VWLineNode::setValues(const vector<glm::vec2>& pts, const vector<float>& di
 static ProfilingZoneID SetHighlightsProfilingZone("VWLineNode::setHighlights");
 
 void VWLineNode::setHighlights(vector<float> xPosns, vector<float> widths)
+{
+    if (xPosns.size() != widths.size()) {
+        throw(Exception(AVG_ERR_INVALID_ARGS,
+                "VWLineNode::setHighlights: xPosns and widths must have the same length."));
+    }
+    setHighlights(int(xPosns.size()), xPosns.data(), widths.data());
+}
+
+void VWLineNode::setHighlights(int numHighlights, const float* pXPosns, const float* pWidths)
 {
     ScopeTimer timer(SetHighlightsProfilingZone);
     if (m_Pts.size() == 0) {
         throw(Exception(AVG_ERR_UNSUPPORTED, "Call setValues before setHighlights."));
     }
-    for (int i=0; i<xPosns.size(); ++i) {
-        float leftX = xPosns[i];
-        float w = max(widths[i], 2.f);
-        float rightX = leftX + w;
-        glm::vec2 curPt = posOnLine(leftX);
-        m_VertexCoords.push_back(curPt + glm::vec2(0,-3));
-        m_VertexCoords.push_back(curPt + glm::vec2(0,3));
+
+    // Sort the highlights by left edge and merge overlapping ones, so the line points are swept only once.
+    m_HighlightIntervals.resize(numHighlights);
+    for (int i=0; i<numHighlights; ++i) {
+        float leftX = pXPosns[i];
+        float w = max(pWidths[i], 2.f);
+        m_HighlightIntervals[i] = glm::vec2(leftX, leftX + w);
+    }
+    auto isLeftOf = [](const glm::vec2& i1, const glm::vec2& i2) { return i1.x < i2.x; };
+    if (!is_sorted(m_HighlightIntervals.begin(), m_HighlightIntervals.end(), isLeftOf)) {
+        sort(m_HighlightIntervals.begin(), m_HighlightIntervals.end(), isLeftOf);
+    }
+
+    int ptIndex = 0;
+    int i = 0;
+    while (i < numHighlights) {
+        float leftX = m_HighlightIntervals[i].x;
+        float rightX = m_HighlightIntervals[i].y;
+        for (++i; i < numHighlights && m_HighlightIntervals[i].x < rightX; ++i) {
+            rightX = max(rightX, m_HighlightIntervals[i].y);
+        }
+        appendHighlightStrip(leftX, rightX, ptIndex);
+    }
+    setDrawNeeded();
+}
+
+// Appends a strip along the line from leftX to the last full pixel column before rightX. The strip has a vertex
+// pair at both ends and at the line points in between that deviate more than m_HighlightTolerance pixels from a
+// straight strip, so the number of vertices doesn't depend on the width of the highlight.
+void VWLineNode::appendHighlightStrip(float leftX, float rightX, int& ptIndex)
+{
+    float endX = leftX + max(1.f, ceil(rightX - leftX) - 1);
+    m_HighlightPts.clear();
+    m_HighlightPts.push_back(posOnLine(leftX, ptIndex));
+    int innerIndex = ptIndex;
+    while (innerIndex < int(m_Pts.size()) && m_Pts[innerIndex].x <= leftX) {
+        innerIndex++;
+    }
+    for (; innerIndex < int(m_Pts.size()) && m_Pts[innerIndex].x < endX; ++innerIndex) {
+        m_HighlightPts.push_back(m_Pts[innerIndex]);
+    }
+    m_HighlightPts.push_back(posOnLine(endX, ptIndex));
+
+    int anchor = 0;
+    for (int i=0; i<int(m_HighlightPts.size()); ++i) {
+        bool bIsEnd = (i == 0 || i == int(m_HighlightPts.size())-1);
+        if (!bIsEnd) {
+            // Keep point i if skipping the next point would move a skipped point by more than the tolerance.
+            const glm::vec2& anchorPt = m_HighlightPts[anchor];
+            const glm::vec2& nextPt = m_HighlightPts[i+1];
+            bool bKeep = false;
+            for (int j=anchor+1; j<=i && !bKeep; ++j) {
+                float part = (m_HighlightPts[j].x - anchorPt.x) / (nextPt.x - anchorPt.x);
+                float y = (1-part)*anchorPt.y + part*nextPt.y;
+                bKeep = fabs(y - m_HighlightPts[j].y) > m_HighlightTolerance;
+            }
+            if (!bKeep) {
+                continue;
+            }
+        }
+        anchor = i;
+        int vi = m_VertexCoords.size();
+        const glm::vec2& pt = m_HighlightPts[i];
+        m_VertexCoords.push_back(pt + glm::vec2(0,-3));
+        m_VertexCoords.push_back(pt + glm::vec2(0,3));
         appendColors(2, Pixel32(255,255,255,255), 255);
-        for (float x = leftX+1; x < rightX; ++x) {
-            int vi = m_VertexCoords.size();
-            curPt = posOnLine(x);
-            m_VertexCoords.push_back(curPt + glm::vec2(0,-3));
-            m_VertexCoords.push_back(curPt + glm::vec2(0,3));
-            appendColors(2, Pixel32(255,255,255,255), 255);
+        if (i > 0) {
             m_Triangles.push_back(glm::ivec3(vi-2, vi+1, vi-1));
             m_Triangles.push_back(glm::ivec3(vi-2, vi  , vi+1));
         }
@@ -187,10 +266,11 @@ float VWLineNode::calcOpacity(float dist)
     }
 }
 
-glm::vec2 VWLineNode::posOnLine(float x) const
+// Returns the point on the line at x. ptIndex is the index to start searching at. It is updated, so calls with
+// increasing x walk the points only once.
+glm::vec2 VWLineNode::posOnLine(float x, int& ptIndex) const
 {
-    int ptIndex = 0;
-    while (m_Pts[ptIndex].x < x && ptIndex < m_Pts.size()-1) {
+    while (m_Pts[ptIndex].x < x && ptIndex < int(m_Pts.size())-1) {
         ptIndex++;
     }
     glm::vec2 curPt;
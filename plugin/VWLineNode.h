@@ -37,7 +37,9 @@ class VWLineNode: public avg::VectorNode
 
         void setValues(const std::vector<glm::vec2>& pts,
                 const std::vector<float>& dists);
+        void setValues(int numPts, const glm::vec2* pPts, const float* pDists);
         void setHighlights(std::vector<float> xPosns, std::vector<float> widths);
+        void setHighlights(int numHighlights, const float* pXPosns, const float* pWidths);
         
         virtual void calcVertexes(const avg::VertexDataPtr& pVertexData,
                 avg::Pixel32 color);
@@ -48,15 +50,22 @@ class VWLineNode: public avg::VectorNode
         float calcVertWidth(float width, float angle);
         float getLineAngle(const glm::vec2& pt1, const glm::vec2& pt2);
         float calcOpacity(float dist);
-        glm::vec2 posOnLine(float x) const;
+        glm::vec2 posOnLine(float x, int& ptIndex) const;
+        void appendHighlightStrip(float leftX, float rightX, int& ptIndex);
 
+        // The vectors keep their capacity between updates, so redrawing doesn't allocate memory.
         std::vector<glm::vec2> m_Pts;
+        std::vector<float> m_ClampedDists;
+        std::vector<float> m_Widths;
+        std::vector<glm::vec2> m_HighlightIntervals;
+        std::vector<glm::vec2> m_HighlightPts;
         std::vector<glm::vec2> m_VertexCoords;
         std::vector<avg::Pixel32> m_Colors;
         std::vector<glm::ivec3> m_Triangles;
 
         float m_MaxWidth;
         bool m_bUseOpacity;
+        float m_HighlightTolerance;
 };
 
 typedef boost::shared_ptr<VWLineNode> VWLineNodePtr;
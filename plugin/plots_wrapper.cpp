@@ -18,7 +18,9 @@
 #include "ScatterPlotNode.h"
 #include "User.h"
 #include "HeadData.h"
+#include "Path.h"
 
+#include <base/Exception.h>
 #include <base/GeomHelper.h>
 
 #include <wrapper/raw_constructor.hpp>
@@ -33,32 +35,265 @@ using namespace avg;
 char VWLineNodeName[] = "vwlinenode";
 char ScatterPlotNodeName[] = "scatterplotnode";
 
+// Contiguous view of the memory of a python object that supports the buffer protocol (e.g. a numpy array).
+// The elements must be of the type given by format ('f': float32, 'd': float64) and consist of
+// numComponents values each. The python object is kept alive as long as the view exists.
+class PyBufferView: boost::noncopyable
+{
+public:
+    PyBufferView(const object& obj, char format, int numComponents, const string& sName)
+    {
+        if (PyObject_GetBuffer(obj.ptr(), &m_View, PyBUF_C_CONTIGUOUS | PyBUF_FORMAT) == -1) {
+            throw_error_already_set();
+        }
+        string sFormat = m_View.format ? m_View.format : "B";
+        int itemSize = (format == 'd') ? sizeof(double) : sizeof(float);
+        if (sFormat[sFormat.size()-1] != format || m_View.itemsize != itemSize ||
+                m_View.len % (itemSize*numComponents) != 0)
+        {
+            PyBuffer_Release(&m_View);
+            throw Exception(AVG_ERR_INVALID_ARGS, sName + ": Expected contiguous buffer of " +
+                    (format == 'd' ? "float64" : "float32") + " values.");
+        }
+        m_NumElements = int(m_View.len / (itemSize*numComponents));
+    }
+
+    ~PyBufferView()
+    {
+        PyBuffer_Release(&m_View);
+    }
+
+    int getNumElements() const
+    {
+        return m_NumElements;
+    }
+
+    template<class T>
+    const T* getData() const
+    {
+        return reinterpret_cast<const T*>(m_View.buf);
+    }
+
+private:
+    Py_buffer m_View;
+    int m_NumElements;
+};
+
+typedef boost::shared_ptr<PyBufferView> PyBufferViewPtr;
+typedef vector<PyBufferViewPtr> PyBufferViewList;
+
+static void checkNumElements(const PyBufferViewList& views, const string& sFuncName)
+{
+    for (auto pView: views) {
+        if (pView->getNumElements() != views[0]->getNumElements()) {
+            throw Exception(AVG_ERR_INVALID_ARGS, sFuncName + ": All arrays must have the same length.");
+        }
+    }
+}
+
+// The User references the array memory directly (no copy), so the arrays can be memory-mapped.
+void setUserHeadDataWithViewpoints(User& user, const object& times, const object& posns, const object& rots,
+        const object& posPrefixSums, const object& wallViewpoints)
+{
+    boost::shared_ptr<PyBufferViewList> pViews(new PyBufferViewList());
+    PyBufferViewList& views = *pViews;
+    views.push_back(PyBufferViewPtr(new PyBufferView(times, 'd', 1, "times")));
+    views.push_back(PyBufferViewPtr(new PyBufferView(posns, 'f', 3, "posns")));
+    views.push_back(PyBufferViewPtr(new PyBufferView(rots, 'f', 3, "rots")));
+    views.push_back(PyBufferViewPtr(new PyBufferView(posPrefixSums, 'f', 3, "posPrefixSums")));
+    const glm::vec2* pWallViewpoints = 0;
+    if (!wallViewpoints.is_none()) {
+        views.push_back(PyBufferViewPtr(new PyBufferView(wallViewpoints, 'f', 2, "wallViewpoints")));
+        pWallViewpoints = views[4]->getData<glm::vec2>();
+    }
+    checkNumElements(views, "User.setHeadData");
+    user.setHeadData(views[0]->getNumElements(), views[0]->getData<double>(), views[1]->getData<glm::vec3>(),
+            views[2]->getData<glm::vec3>(), views[3]->getData<glm::vec3>(), pWallViewpoints, pViews);
+}
+
+void setUserHeadData(User& user, const object& times, const object& posns, const object& rots,
+        const object& posPrefixSums)
+{
+    setUserHeadDataWithViewpoints(user, times, posns, rots, posPrefixSums, object());
+}
+
+void setUserTouches(User& user, const object& times, const object& posns, const object& durations)
+{
+    PyBufferViewList views;
+    views.push_back(PyBufferViewPtr(new PyBufferView(times, 'f', 1, "times")));
+    views.push_back(PyBufferViewPtr(new PyBufferView(posns, 'f', 2, "posns")));
+    views.push_back(PyBufferViewPtr(new PyBufferView(durations, 'f', 1, "durations")));
+    checkNumElements(views, "User.setTouches");
+    user.setTouches(views[0]->getNumElements(), views[0]->getData<float>(), views[1]->getData<glm::vec2>(),
+            views[2]->getData<float>());
+}
+
+// Returns the times, positions and durations of the touches between startTime and endTime as tuple of
+// three strings containing float32 values (e.g. for numpy.frombuffer).
+boost::python::tuple getUserTouchArrays(const User& user, float startTime, float endTime)
+{
+    int first, last;
+    user.getTouchIndexRange(startTime, endTime, first, last);
+    int numTouches = last - first;
+    return boost::python::make_tuple(
+            str((const char*)(user.getTouchTimeArray() + first), numTouches*sizeof(float)),
+            str((const char*)(user.getTouchPosArray() + first), numTouches*sizeof(glm::vec2)),
+            str((const char*)(user.getTouchDurationArray() + first), numTouches*sizeof(float)));
+}
+
+// Buffer versions of VWLineNode::setValues and setHighlights: The arguments are contiguous float32 arrays,
+// so they don't need to be converted element by element.
+void setVWLineValueArrays(VWLineNode& node, const object& pts, const object& dists)
+{
+    PyBufferViewList views;
+    views.push_back(PyBufferViewPtr(new PyBufferView(pts, 'f', 2, "pts")));
+    views.push_back(PyBufferViewPtr(new PyBufferView(dists, 'f', 1, "dists")));
+    checkNumElements(views, "VWLineNode.setValueArrays");
+    node.setValues(views[0]->getNumElements(), views[0]->getData<glm::vec2>(), views[1]->getData<float>());
+}
+
+void setVWLineHighlightArrays(VWLineNode& node, const object& xPosns, const object& widths)
+{
+    PyBufferViewList views;
+    views.push_back(PyBufferViewPtr(new PyBufferView(xPosns, 'f', 1, "xPosns")));
+    views.push_back(PyBufferViewPtr(new PyBufferView(widths, 'f', 1, "widths")));
+    checkNumElements(views, "VWLineNode.setHighlightArrays");
+    node.setHighlights(views[0]->getNumElements(), views[0]->getData<float>(), views[1]->getData<float>());
+}
+
+// Buffer versions of the ScatterPlotNode position setters. posns is a contiguous float32 array of 2D points.
+void setScatterPlotPosnArray(ScatterPlotNode& node, const object& posns)
+{
+    PyBufferView view(posns, 'f', 2, "posns");
+    node.setPosns(view.getNumElements(), view.getData<glm::vec2>());
+}
+
+void addScatterPlotPosnArray(ScatterPlotNode& node, const object& posns)
+{
+    PyBufferView view(posns, 'f', 2, "posns");
+    node.addPosns(view.getNumElements(), view.getData<glm::vec2>());
+}
+
+void removeScatterPlotPosnArray(ScatterPlotNode& node, const object& posns)
+{
+    PyBufferView view(posns, 'f', 2, "posns");
+    node.removePosns(view.getNumElements(), view.getData<glm::vec2>());
+}
+
+boost::python::tuple getUserTouchIndexRange(const User& user, float startTime, float endTime)
+{
+    int first, last;
+    user.getTouchIndexRange(startTime, endTime, first, last);
+    return boost::python::make_tuple(first, last);
+}
+
+// Returns User::getHeadPosns as string of float32 values (x, y, z per sample).
+str getUserHeadPosns(const User& user, float startTime, float timeStep, int numSamples)
+{
+    vector<glm::vec3> posns = user.getHeadPosns(startTime, timeStep, numSamples);
+    return str((const char*)posns.data(), posns.size()*sizeof(glm::vec3));
+}
+
+// Returns User::getHeadPosAvgs as string of float32 values (x, y, z per sample).
+str getUserHeadPosAvgs(const User& user, float startTime, float timeStep, int numSamples, int smoothness)
+{
+    vector<glm::vec3> posns = user.getHeadPosAvgs(startTime, timeStep, numSamples, smoothness);
+    return str((const char*)posns.data(), posns.size()*sizeof(glm::vec3));
+}
+
+// Returns User::getHeadPosExtents as tuple of two strings of float32 values (minimums, maximums).
+boost::python::tuple getUserHeadPosExtents(const User& user, float startTime, float endTime, int numBuckets)
+{
+    vector<glm::vec3> mins;
+    vector<glm::vec3> maxs;
+    user.getHeadPosExtents(startTime, endTime, numBuckets, mins, maxs);
+    return boost::python::make_tuple(
+            str((const char*)mins.data(), mins.size()*sizeof(glm::vec3)),
+            str((const char*)maxs.data(), maxs.size()*sizeof(glm::vec3)));
+}
+
+// Return User::getHeadXZPosHeatMap and User::getHeadViewpointHeatMap as strings of float32 values, row by row.
+str getUserHeadXZPosHeatMap(const User& user, float startTime, float endTime, const glm::vec2& rangeMin,
+        const glm::vec2& rangeMax, const glm::ivec2& mapSize)
+{
+    vector<float> counts;
+    user.getHeadXZPosHeatMap(startTime, endTime, rangeMin, rangeMax, mapSize, counts);
+    return str((const char*)counts.data(), counts.size()*sizeof(float));
+}
+
+str getUserHeadViewpointHeatMap(const User& user, float startTime, float endTime, const glm::vec2& rangeMin,
+        const glm::vec2& rangeMax, const glm::ivec2& mapSize)
+{
+    vector<float> counts;
+    user.getHeadViewpointHeatMap(startTime, endTime, rangeMin, rangeMax, mapSize, counts);
+    return str((const char*)counts.data(), counts.size()*sizeof(float));
+}
+
+// Simplifies a path given as float32 array of 2D points. mode is "rdp" (Ramer-Douglas-Peucker, tolerance is
+// the maximum distance) or "vw" (Visvalingam-Whyatt, tolerance is the minimum triangle area).
+// Returns the indexes of the points to keep as string of int32 values.
+str simplifyPathBuffer(const object& pts, float tolerance, const string& sMode)
+{
+    PyBufferView view(pts, 'f', 2, "pts");
+    vector<int> keptIndexes;
+    if (sMode == "rdp") {
+        simplifyPathRDP(view.getNumElements(), view.getData<glm::vec2>(), tolerance, keptIndexes);
+    } else if (sMode == "vw") {
+        simplifyPathVW(view.getNumElements(), view.getData<glm::vec2>(), tolerance, keptIndexes);
+    } else {
+        throw Exception(AVG_ERR_INVALID_ARGS, "simplifyPath: mode must be 'rdp' or 'vw'.");
+    }
+    return str((const char*)keptIndexes.data(), keptIndexes.size()*sizeof(int));
+}
+
 BOOST_PYTHON_MODULE(plots)
 {
+    def("simplifyPath", &simplifyPathBuffer, (boost::python::arg("pts"), boost::python::arg("tolerance"),
+            boost::python::arg("mode")="rdp"));
+
     class_<VWLineNode, bases<avg::VectorNode>, boost::noncopyable>("VWLineNode", no_init)
         .def("__init__", raw_constructor(createNode<VWLineNodeName>))
-        .def("setValues", &VWLineNode::setValues)
-        .def("setHighlights", &VWLineNode::setHighlights)
+        .def("setValues", (void (VWLineNode::*)(const vector<glm::vec2>&, const vector<float>&))
+                &VWLineNode::setValues)
+        .def("setValueArrays", &setVWLineValueArrays)
+        .def("setHighlights", (void (VWLineNode::*)(vector<float>, vector<float>))&VWLineNode::setHighlights)
+        .def("setHighlightArrays", &setVWLineHighlightArrays)
         ;
 
     class_<ScatterPlotNode, bases<avg::RasterNode>, boost::noncopyable>("ScatterPlotNode", no_init)
         .def("__init__", raw_constructor(createNode<ScatterPlotNodeName>))
-        .def("setPosns", &ScatterPlotNode::setPosns)
+        .def("setPosns", (void (ScatterPlotNode::*)(const vector<glm::vec2>&))&ScatterPlotNode::setPosns)
+        .def("setPosnArray", &setScatterPlotPosnArray)
+        .def("addPosnArray", &addScatterPlotPosnArray)
+        .def("removePosnArray", &removeScatterPlotPosnArray)
         ;
 
-    class_<User>("User", init<int, float>())
+    class_<User, boost::noncopyable>("User", init<int, double, float>())
         .def("addHeadData", &User::addHeadData)
+        .def("setHeadData", &setUserHeadData)
+        .def("setHeadData", &setUserHeadDataWithViewpoints)
         .def("addTouch", &User::addTouch)
+        .def("setTouches", &setUserTouches)
         .def("getUserID", &User::getUserID)
         .def("getHeadPos", make_function(&User::getHeadPos, return_value_policy<copy_const_reference>()))
         .def("getWallViewpoint", make_function(&User::getWallViewpoint, return_value_policy<copy_const_reference>()))
         .def("getHeadRot", make_function(&User::getHeadRot, return_value_policy<copy_const_reference>()))
         .def("getHeadPosAvg", &User::getHeadPosAvg)
-        .def("getDistTravelled", &User::getDistTravelled)
+        .def("getHeadPosns", &getUserHeadPosns)
+        .def("getHeadPosAvgs", &getUserHeadPosAvgs)
+        .def("getHeadPosExtents", &getUserHeadPosExtents)
+        .def("getDistTravelled", (float (User::*)(float, float) const)&User::getDistTravelled)
+        .def("getDistTravelled", (float (User::*)(float, float, float) const)&User::getDistTravelled)
         .def("getAvgDistFromWall", &User::getAvgDistFromWall)
         .def("getHeadXZPosns", &User::getHeadXZPosns)
         .def("getHeadViewpoints", &User::getHeadViewpoints)
+        .def("getHeadXZPosHeatMap", &getUserHeadXZPosHeatMap)
+        .def("getHeadViewpointHeatMap", &getUserHeadViewpointHeatMap)
+        .def("countTouches", &User::countTouches)
         .def("getTouches", &User::getTouches)
+        .def("getTouchPosns", &User::getTouchPosns)
+        .def("getTouchArrays", &getUserTouchArrays)
+        .def("getTouchIndexRange", &getUserTouchIndexRange)
         ;
 
     class_<HeadData>("HeadData", init<int, const glm::vec3&, const glm::vec3&, double>())
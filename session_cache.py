@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+# GIAnT Group Interaction Analysis Toolkit
+# Copyright (C) 2017 Interactive Media Lab Dresden
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# Binary cache of the data of one session, stored next to the database.
+# File layout: A json header (padded to HEADER_SIZE bytes) that contains the session info and the offset and
+# length of every array, followed by the raw arrays of all users. The arrays are memory-mapped when reading,
+# so loading a session doesn't copy the data and several processes share the same pages.
+
+import json
+import os
+
+import numpy as np
+
+VERSION = 1
+HEADER_SIZE = 16384
+ALIGNMENT = 64
+
+# Arrays stored per user: name, dtype, number of components per entry.
+USER_ARRAYS = [
+    ("times", np.float64, 1),               # Head data
+    ("posns", np.float32, 3),
+    ("rots", np.float32, 3),
+    ("pos_prefix_sums", np.float32, 3),
+    ("viewpts", np.float32, 2),
+    ("touch_times", np.float32, 1),         # Touches
+    ("touch_posns", np.float32, 2),
+    ("touch_durations", np.float32, 1),
+]
+
+
+def to_user_data(**arrays):
+    """
+    Converts the arrays of a user to the types stored in the cache.
+    :param arrays: One keyword argument per entry in USER_ARRAYS.
+    :return: dict of contiguous arrays
+    """
+    user_data = {}
+    for name, dtype, num_components in USER_ARRAYS:
+        user_data[name] = np.ascontiguousarray(arrays[name], dtype=dtype)
+        assert(user_data[name].size == len(user_data[name]) * num_components)
+    return user_data
+
+
+def write(filename, session_info, users_data):
+    """
+    :param session_info: dict of values that identify the session data (see read())
+    :param users_data: list of dicts as returned by to_user_data, one per user
+    """
+    header = {"version": VERSION, "session_info": session_info, "users": []}
+    offset = HEADER_SIZE
+    for user_data in users_data:
+        layout = {}
+        for name, dtype, num_components in USER_ARRAYS:
+            layout[name] = (offset, len(user_data[name]))
+            offset += user_data[name].nbytes
+            offset += -offset % ALIGNMENT
+        header["users"].append(layout)
+    header_str = json.dumps(header)
+    assert(len(header_str) < HEADER_SIZE)
+
+    # Write to a temporary file first, so other processes never see a partially written cache.
+    tmp_filename = "{}.{}.tmp".format(filename, os.getpid())
+    with open(tmp_filename, "wb") as f:
+        f.write(header_str.ljust(HEADER_SIZE, "\0"))
+        for user_data, layout in zip(users_data, header["users"]):
+            for name, dtype, num_components in USER_ARRAYS:
+                f.seek(layout[name][0])
+                user_data[name].tofile(f)
+        # Include the padding after the last array, so empty arrays at the end still lie inside the file.
+        f.truncate(offset)
+    os.rename(tmp_filename, filename)
+
+
+def read(filename, session_info):
+    """
+    Memory-maps a cache file.
+    :param session_info: Must be equal to the session_info the cache was written with.
+    :return: list of dicts of arrays (see USER_ARRAYS) per user, None if there is no valid cache.
+    """
+    if not os.path.exists(filename):
+        return None
+    mapped = np.memmap(filename, dtype=np.uint8, mode="r")
+    header = json.loads(mapped[:HEADER_SIZE].tostring().rstrip("\0"))
+    if header["version"] != VERSION or header["session_info"] != session_info:
+        return None
+
+    users_data = []
+    for layout in header["users"]:
+        user_data = {}
+        for name, dtype, num_components in USER_ARRAYS:
+            offset, length = layout[name]
+            if num_components == 1:
+                shape = (length,)
+            else:
+                shape = (length, num_components)
+            user_data[name] = np.ndarray(shape, dtype=dtype, buffer=mapped, offset=offset)
+        users_data.append(user_data)
+    return users_data
+
+
+def remove(filename):
+    if os.path.exists(filename):
+        os.remove(filename)
@@ -16,16 +16,23 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import argparse
 import csv
-import sqlite3
-import pat_model
+import hashlib
+import itertools
+import multiprocessing
+import os
 import time
 
-from libavg import player
+import numpy as np
 
-TIME_STEP = 1./30            # User position data stored with 30 FPS
+import pat_model
+import session_cache
 
-player.loadPlugin("plots")
+TIME_STEP = 1./30            # User position data stored with 30 FPS
+CSV_CHUNK_SIZE = 50000       # Number of csv lines processed and written at once
+IMPORT_QUEUE_SIZE = 4        # Number of resampled chunks a worker process buffers for the db writer
+SESSIONS = [(session_num, level) for session_num in (3,4,5) for level in range(2)]
 
 
 # Converts time from csv format to float seconds since 1970.
@@ -37,108 +44,171 @@ def csvtime_to_float(date, csv_time):
     return time.mktime(time_struct) + float(millisecs) / 1000
 
 
-def create_table(table, columns):
+# Vectorized version of csvtime_to_float for a list of timestamps recorded on the same day.
+def csvtimes_to_float(date, csv_times):
+    day_start = time.mktime(time.strptime(date, "%Y-%m-%d"))
+    time_parts = np.array([csv_time.replace(".", ":").split(":") for csv_time in csv_times], dtype=float)
+    return day_start + time_parts.dot([3600., 60., 1., 0.001])
+
+
+def read_csv_chunks(filename):
+    with open(filename) as f:
+        reader = csv.reader(f)
+        next(reader)
+        while True:
+            lines = list(itertools.islice(reader, CSV_CHUNK_SIZE))
+            if not lines:
+                break
+            yield lines
+
+
+def create_table(table, columns, rebuild):
     """
     :param table: name of the table (string)
     :param columns: columns separated by commas (string) i.e. "id INT, value1 FLOAT, value2 VARCHAR..."
+    :param rebuild: if True, an existing table is dropped first
     :return:
     """
-    pat_model.execute_qry("DROP TABLE IF EXISTS " + table + ";")
-    pat_model.execute_qry("CREATE TABLE " + table + " (" + columns + ");")
+    if rebuild:
+        pat_model.execute_qry("DROP TABLE IF EXISTS " + table + ";")
+    pat_model.execute_qry("CREATE TABLE IF NOT EXISTS " + table + " (" + columns + ");")
 
 
-def import_optitrack(session):
+def get_source_files(session):
+    return [os.path.relpath(session.data_dir + "/" + filename)
+            for filename in (session.optitrack_filename, session.touch_filename)]
 
-    def head_data_from_csv(csv_record, date):
-        timestamp = csvtime_to_float(date, csv_record[0])
-        userid = eval(csv_record[1])-1
-        pos = list(eval(csv_record[2]))
-        # pos is in Meters, origin is lower left corner of the wall.
-        # In the CSV file:
-        #   If facing the wall, x points left, y up, z into the wall
-        # In the DB:
-        #   If facing the wall, x points right, y up, z away from the wall
-        pos[0] = -pos[0]
-        pos[2] = -pos[2]
-        # Rotation is yaw, pitch, roll, origin is facing wall.
-        rotation = eval(csv_record[3])
-        head_data = plots.HeadData(userid, pos, rotation, timestamp)
-        return head_data
 
-    def create_interpolated_head_data(data1, data2, cur_time, prev_data):
+def hash_file(path):
+    sha1 = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha1.update(block)
+    return sha1.hexdigest()
 
-        def interpolate(x1, x2, ratio):
-            return x1 * ratio + x2 * (1 - ratio)
 
-        if data1 is None:
-            data = data2
-        else:
-            part = (cur_time - data1.time) / (data2.time - data1.time)
-            assert(data1.userid == data2.userid)
-            pos = [interpolate(data1.pos[0], data2.pos[0], part),
-                    interpolate(data1.pos[1], data2.pos[1], part),
-                    interpolate(data1.pos[2], data2.pos[2], part)]
-            rot = [interpolate(data1.rot[0], data2.rot[0], part),
-                    interpolate(data1.rot[1], data2.rot[1], part),
-                    interpolate(data1.rot[2], data2.rot[2], part)]
-            data = plots.HeadData(data1.userid, pos, rot, cur_time)
-        if prev_data:
-            prev_prefix_sum = prev_data.posPrefixSum
-            data.posPrefixSum = (
-                prev_prefix_sum[0] + data.pos[0],
-                prev_prefix_sum[1] + data.pos[1],
-                prev_prefix_sum[2] + data.pos[2])
+def get_import_params(session):
+    # Session settings that the imported data depends on.
+    return repr(session.user_pitch_offsets)
+
+
+def get_changed_fingerprints(con, session):
+    """
+    Compares the source files and import settings of a session with the import manifest.
+    :return: List of (path, size, mtime, hash) fingerprints of the source files if the session needs to be
+        (re-)imported, None if the session is up to date.
+    """
+    fingerprints = []
+    is_changed = False
+    for path in get_source_files(session):
+        stat = os.stat(path)
+        entry = con.execute("SELECT session, level, params, size, mtime, hash FROM import_manifest WHERE path=?;",
+                (path,)).fetchone()
+        session_key = (session.session_num, session.level_num, get_import_params(session))
+        if entry is not None and entry[:5] == session_key + (stat.st_size, stat.st_mtime):
+            file_hash = entry[5]
         else:
-            data.posPrefixSum = data.pos
+            # Size or mtime differ: only the content hash decides whether the file really changed.
+            file_hash = hash_file(path)
+            if entry is None or entry[:4] != session_key + (stat.st_size,) or entry[5] != file_hash:
+                is_changed = True
+        fingerprints.append((path, stat.st_size, stat.st_mtime, file_hash))
+    if is_changed:
+        return fingerprints
+    else:
+        # Content unchanged: only remember the new mtimes so the files aren't hashed again next time.
+        for path, size, mtime, file_hash in fingerprints:
+            con.execute("UPDATE import_manifest SET mtime=? WHERE path=?;", (mtime, path))
+        con.commit()
+        return None
+
+
+class HeadResampler(object):
+    """
+    Resamples the head data of one user onto a regular TIME_STEP grid. The csv data is fed in chunks; the
+    last csv sample, the grid position and the position prefix sum are carried over between chunks.
+    """
+    def __init__(self):
+        self.__start_time = None
+        self.__next_step = 0
+        self.__last_sample = None
+        self.__prefix_sum = np.zeros(3)
+
+    def resample(self, times, posns, rots):
+        """
+        :param times: csv timestamps of the user (array, ascending)
+        :param posns: head positions (n x 3 array)
+        :param rots: head rotations (n x 3 array)
+        :return: Array with one row (x, y, z, pitch, yaw, roll, time, x_sum, y_sum, z_sum) per TIME_STEP.
+        """
+        # Discard lines with equal timestamps
+        is_new = np.ones(len(times), dtype=bool)
+        is_new[1:] = times[1:] != times[:-1]
+        if self.__last_sample is not None:
+            is_new[0] = times[0] != self.__last_sample[0]
+        samples = np.column_stack((times, posns, rots))[is_new]
+        if self.__last_sample is not None:
+            samples = np.vstack((self.__last_sample, samples))
+        if len(samples) == 0:
+            return np.empty((0, 10))
+
+        if self.__start_time is None:
+            self.__start_time = samples[0, 0]
+        # The original (csv) data has irregular timestamps, the db should contain data every TIME_STEP.
+        end_step = int(np.ceil((samples[-1, 0] - self.__start_time) / TIME_STEP))
+        if self.__last_sample is None:
+            end_step = max(end_step, 1)
+        grid = self.__start_time + TIME_STEP * np.arange(self.__next_step, end_step)
+        data = np.empty((len(grid), 10))
+        for i in range(6):
+            data[:, i] = np.interp(grid, samples[:, 0], samples[:, i+1])
+        data[:, 6] = grid
+        data[:, 7:10] = self.__prefix_sum + np.cumsum(data[:, 0:3], axis=0)
+
+        if len(data) > 0:
+            self.__prefix_sum = data[-1, 7:10]
+        self.__next_step = max(self.__next_step, end_step)
+        self.__last_sample = samples[-1]
         return data
 
-    def head_data_to_list(head):
-        return (session.session_num, session.level_num, head.userid,
-                head.pos[0], head.pos[1], head.pos[2],
-                head.rot[0], head.rot[1], head.rot[2],
-                head.time,
-                head.posPrefixSum[0], head.posPrefixSum[1], head.posPrefixSum[2])
 
-    print "Importing optitrack data:"
-    print "  Reading csv"
-    with open(session.data_dir+"/"+session.optitrack_filename) as f:
-        reader = csv.reader(f)
-        csv_data = list(reader)
-        csv_data.pop(0)
-    print "  Processing"
-    last_lines = [None] * session.num_users
-    last_db_time = [None] * session.num_users
-    last_interpol_data = [None] * session.num_users
-    db_list = []
-    for data_line in csv_data:
-        head_data = head_data_from_csv(data_line, session.date)
-        userid = head_data.userid
-        last_data = last_lines[userid]
-        if (last_data is not None) and (last_data.time == head_data.time):  # Discard equal lines
-            continue
-        while last_db_time[userid] < head_data.time:
-            # The original (csv) data has irregular timestamps, the db should contain data every
-            # TIME_STEP.
-            interpol_data = create_interpolated_head_data(last_data, head_data, last_db_time[userid],
-                    last_interpol_data[head_data.userid])
-            db_list.append(head_data_to_list(interpol_data))
-            if last_db_time[userid] is None:
-                last_db_time[userid] = head_data.time
-            else:
-                last_db_time[userid] += TIME_STEP
-            last_interpol_data[userid] = interpol_data
-        last_lines[userid] = head_data
-    print "  Writing database"
-    con = sqlite3.connect("db")
-    cur = con.cursor()
-    cur.executemany(
-        "INSERT INTO head (session, level, user, x, y, z, pitch, yaw, roll, time, x_sum, y_sum, z_sum) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?);",
-        db_list)
-    con.commit()
-    con.close()
+def resample_optitrack(session):
+    """
+    Generator that reads the optitrack csv file of a session in chunks and yields the resampled db rows
+    of each chunk as an array with the columns of the head table (without ID). The wall viewpoints are
+    calculated here, so the application doesn't need to calculate them when loading a session.
+    """
+    resamplers = {}
+    for lines in read_csv_chunks(session.data_dir + "/" + session.optitrack_filename):
+        times = csvtimes_to_float(session.date, [line[0] for line in lines])
+        userids = np.array([line[1] for line in lines], dtype=int) - 1
+        # pos is in Meters, origin is lower left corner of the wall.
+        # In the CSV file:
+        #   If facing the wall, x points left, y up, z into the wall
+        # In the DB:
+        #   If facing the wall, x points right, y up, z away from the wall
+        posns = np.array([line[2].strip("() ").split(",") for line in lines], dtype=float)
+        posns[:, 0] = -posns[:, 0]
+        posns[:, 2] = -posns[:, 2]
+        # Rotation is yaw, pitch, roll, origin is facing wall.
+        rots = np.array([line[3].strip("() ").split(",")[:3] for line in lines], dtype=float)
+
+        user_rows = []
+        for userid in np.unique(userids):
+            if userid not in resamplers:
+                resamplers[userid] = HeadResampler()
+            is_user = userids == userid
+            data = resamplers[userid].resample(times[is_user], posns[is_user], rots[is_user])
+            rows = np.empty((len(data), 15))
+            rows[:, 0:3] = session.session_num, session.level_num, userid
+            rows[:, 3:13] = data
+            rows[:, 13:15] = pat_model.calc_wall_viewpoints(*session.correct_head_data(userid, data[:, 0:3],
+                    data[:, 3:6]))
+            user_rows.append(rows)
+        yield np.vstack(user_rows)
 
 
-def import_touches(session):
+def read_touches(session):
     def tool_to_userid(tool):
         if tool == "Pick":
             i = 0
@@ -152,40 +222,120 @@ def import_touches(session):
             return None
         return session.tool_to_userid[i]
 
-    print "Importing touch data:"
-
-    print "  Reading csv"
-    with open(session.data_dir + "/" + session.touch_filename) as f:
-        reader = csv.reader(f)
-        csv_data = list(reader)
-        csv_data.pop(0)
-    print "  Processing"
     db_list = []
     last_time = 0
-    for data in csv_data:
-        timestamp = csvtime_to_float(session.date, data[0])
-        pos = list(eval(data[1]))
-        userid = tool_to_userid(data[2])
-        if userid is None:
-            continue
-        touch = [session.session_num, session.level_num, userid, pos[0], pos[1], timestamp, 0.03]
-        if timestamp > last_time + 0.1:
-            # New touch
-            db_list.append(touch)  # prepare for upload
-        else:
-            # Touch continuation
-            touch[6] += timestamp - last_time
-            db_list[-1] = touch
-        last_time = touch[3]
+    for lines in read_csv_chunks(session.data_dir + "/" + session.touch_filename):
+        for data in lines:
+            timestamp = csvtime_to_float(session.date, data[0])
+            pos = list(eval(data[1]))
+            userid = tool_to_userid(data[2])
+            if userid is None:
+                continue
+            touch = [session.session_num, session.level_num, userid, pos[0], pos[1], timestamp, 0.03]
+            if timestamp > last_time + 0.1:
+                # New touch
+                db_list.append(touch)  # prepare for upload
+            else:
+                # Touch continuation
+                touch[6] += timestamp - last_time
+                db_list[-1] = touch
+            last_time = touch[3]
+    return db_list
+
+
+def stream_session(session, queue):
+    """
+    Parses and resamples all data of a session. Runs in a worker process in parallel imports. Puts the touch list
+    and then the head rows of each csv chunk into queue, followed by None. The queue is bounded, so the worker
+    waits while the db writer is behind.
+    """
+    try:
+        queue.put(read_touches(session))
+        for rows in resample_optitrack(session):
+            queue.put(rows)
+    finally:
+        queue.put(None)
 
-    print "  Writing database"
-    con = sqlite3.connect("db")
+
+def receive_session(queue, result):
+    """
+    Generator for the items that stream_session puts into queue. Raises the exception of the worker process if
+    it failed, before write_session commits.
+    :param result: AsyncResult of stream_session
+    """
+    while True:
+        item = queue.get()
+        if item is None:
+            break
+        yield item
+    result.get()
+
+
+def write_session(con, session, fingerprints, head_batches, touch_list):
+    """
+    Replaces the data of a session in the database in one transaction.
+    :param fingerprints: source file fingerprints as returned by get_changed_fingerprints
+    :param head_batches: iterable of row arrays as returned by resample_optitrack
+    :param touch_list: touch rows as returned by read_touches
+    """
+    print "---- "+session.optitrack_filename+" ----"
+    session_cache.remove(pat_model.get_cache_filename(session.session_num, session.level_num))
     cur = con.cursor()
-    cur.executemany("INSERT INTO touch (session, level, user, x, y, time, duration) VALUES (?,?,?,?,?,?,?);", db_list)
+    level_select = (session.session_num, session.level_num)
+    cur.execute("DELETE FROM head WHERE session=? AND level=?;", level_select)
+    cur.execute("DELETE FROM touch WHERE session=? AND level=?;", level_select)
+    num_rows = 0
+    start_time = float("inf")
+    end_time = float("-inf")
+    for rows in head_batches:
+        cur.executemany(
+            "INSERT INTO head (session, level, user, x, y, z, pitch, yaw, roll, time, x_sum, y_sum, z_sum, "
+            "view_x, view_y) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?);",
+            rows.tolist())
+        num_rows += len(rows)
+        if len(rows) > 0:
+            start_time = min(start_time, rows[:, 9].min())
+            end_time = max(end_time, rows[:, 9].max())
+    if num_rows > 0:
+        cur.execute("INSERT OR REPLACE INTO session_info (session, level, start_time, duration, num_samples) "
+                    "VALUES (?,?,?,?,?);",
+                level_select + (float(start_time), float(end_time - start_time), num_rows))
+    else:
+        cur.execute("DELETE FROM session_info WHERE session=? AND level=?;", level_select)
+    cur.executemany("INSERT INTO touch (session, level, user, x, y, time, duration) VALUES (?,?,?,?,?,?,?);",
+            touch_list)
+    cur.executemany("INSERT OR REPLACE INTO import_manifest (path, session, level, params, size, mtime, hash) "
+                    "VALUES (?,?,?,?,?,?,?);",
+            [(path, session.session_num, session.level_num, get_import_params(session), size, mtime, file_hash)
+                    for path, size, mtime, file_hash in fingerprints])
+    con.commit()
+    print "  Wrote", num_rows, "head rows and", len(touch_list), "touches"
+
+
+def create_indexes(con):
+    """
+    Creates the indexes used by Session.load_from_db. Called after the bulk insert, since inserting into
+    an indexed table is slower than building the index once.
+    """
+    # Covering indexes: A user's data is loaded by a single range scan of the index, sorted by time.
+    con.execute("CREATE INDEX IF NOT EXISTS head_user_time ON head "
+                "(session, level, user, time, x, y, z, pitch, yaw, roll, x_sum, y_sum, z_sum, view_x, view_y);")
+    con.execute("CREATE INDEX IF NOT EXISTS touch_user_time ON touch "
+                "(session, level, user, time, x, y, duration);")
+    # Sessions imported before session_info existed.
+    con.execute("INSERT INTO session_info (session, level, start_time, duration, num_samples) "
+                "SELECT session, level, min(time), max(time) - min(time), count(*) FROM head "
+                "WHERE NOT EXISTS (SELECT 1 FROM session_info "
+                "                  WHERE session_info.session=head.session AND session_info.level=head.level) "
+                "GROUP BY session, level;")
     con.commit()
-    con.close()
 
-def setup():
+
+def create_tables(rebuild):
+    head_columns = [column[1] for column in pat_model.execute_qry("PRAGMA table_info(head);", True)]
+    if "view_x" not in head_columns:
+        # Database from an older version: Rebuild with the current schema.
+        rebuild = True
     create_table("head", "ID INTEGER PRIMARY KEY AUTOINCREMENT,"
                          "session TINYINT NOT NULL,"
                          "level TINYINT NOT NULL,"
@@ -199,7 +349,10 @@ def setup():
                          "time FLOAT NOT NULL,"
                          "x_sum FLOAT,"          # prefix sum for quick calculation of average positions.
                          "y_sum FLOAT,"
-                         "z_sum FLOAT")
+                         "z_sum FLOAT,"
+                         "view_x FLOAT,"         # Intersection of the gaze with the wall
+                         "view_y FLOAT",
+                 rebuild)
     create_table("touch", "ID INTEGER PRIMARY KEY AUTOINCREMENT,"
                           "session TINYINT NOT NULL,"
                           "level TINYINT NOT NULL,"
@@ -207,14 +360,70 @@ def setup():
                           "x FLOAT,"
                           "y FLOAT,"
                           "time FLOAT NOT NULL,"
-                          "duration FLOAT NOT NULL")
-    for session_num in (3,4,5):
-        for level in range(2):
-            session = pat_model.create_session(session_num, level)
-            print "---- "+session.optitrack_filename+" ----"
+                          "duration FLOAT NOT NULL",
+                 rebuild)
+    # Source files of the imported sessions. Sessions are only re-imported if their files changed.
+    create_table("import_manifest", "path TEXT PRIMARY KEY,"
+                                    "session TINYINT NOT NULL,"
+                                    "level TINYINT NOT NULL,"
+                                    "params TEXT NOT NULL,"
+                                    "size INTEGER NOT NULL,"
+                                    "mtime FLOAT NOT NULL,"
+                                    "hash TEXT NOT NULL",
+                 rebuild)
+    # Per-session metadata, so a session can be opened without scanning the head table.
+    create_table("session_info", "session TINYINT NOT NULL,"
+                                 "level TINYINT NOT NULL,"
+                                 "start_time FLOAT NOT NULL,"
+                                 "duration FLOAT NOT NULL,"
+                                 "num_samples INTEGER NOT NULL,"
+                                 "PRIMARY KEY (session, level)",
+                 rebuild)
+
+
+def setup(num_processes, rebuild):
+    create_tables(rebuild)
+
+    con = pat_model.get_connection()
+    sessions = []
+    fingerprints = {}
+    for session_num, level in SESSIONS:
+        session = pat_model.create_session(session_num, level)
+        session_fingerprints = get_changed_fingerprints(con, session)
+        if session_fingerprints is None:
+            print "---- "+session.optitrack_filename+": up to date ----"
+        else:
+            sessions.append(session)
+            fingerprints[session_num, level] = session_fingerprints
+
+    if num_processes > 1 and len(sessions) > 1:
+        # Parsing and resampling runs in the worker processes, this process is the only db writer. Sessions are
+        # written in the order the pool starts them, so the session being written always has a running worker.
+        pool = multiprocessing.Pool(min(num_processes, len(sessions)))
+        manager = multiprocessing.Manager()
+        queues = [manager.Queue(IMPORT_QUEUE_SIZE) for _ in sessions]
+        results = [pool.apply_async(stream_session, (session, queue)) for session, queue in zip(sessions, queues)]
+        for session, queue, result in zip(sessions, queues, results):
+            items = receive_session(queue, result)
+            touch_list = next(items)
+            write_session(con, session, fingerprints[session.session_num, session.level_num], items, touch_list)
+        pool.close()
+        pool.join()
+        manager.shutdown()
+    else:
+        for session in sessions:
+            write_session(con, session, fingerprints[session.session_num, session.level_num],
+                    resample_optitrack(session), read_touches(session))
+    create_indexes(con)
 
-            import_optitrack(session)
-            import_touches(session)
 
-setup()
-print "Database setup complete."
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Imports the csv study data into the database.")
+    parser.add_argument("-j", "--jobs", type=int, default=multiprocessing.cpu_count(),
+            help="Number of sessions imported in parallel (default: number of cores). Each session is streamed "
+                 "into the database in chunks, so memory use doesn't depend on the session length.")
+    parser.add_argument("--rebuild", action="store_true",
+            help="Drop all tables and re-import every session, even if its source files are unchanged.")
+    args = parser.parse_args()
+    setup(args.jobs, args.rebuild)
+    print "Database setup complete."
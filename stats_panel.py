@@ -52,7 +52,8 @@ class StatsPanel(avg.DivNode):
                 is_int = False
             self.__plot.set_attr_interval(i, interval, is_int)
 
-        vis_params.subscribe(vis_params.CHANGED, self.__update)
+        vis_params.subscribe(vis_params.TIME_INTERVAL_CHANGED, self.__update)
+        vis_params.subscribe(vis_params.USER_VISIBILITY_CHANGED, self.__update)
 
     def __init_user_legend(self, colors):
         for i, color in enumerate(colors):
@@ -61,6 +62,7 @@ class StatsPanel(avg.DivNode):
                     fillopacity=1.0, parent=self)
             avg.WordsNode(pos=pos+(40,0), fontsize=global_values.FONT_SIZE, text="User "+str(i+1), parent=self)
 
+    @helper.profiled
     def __update(self, vis_params):
         start_time = vis_params.get_time_interval()[0]
         end_time = vis_params.get_time_interval()[1]
@@ -81,7 +83,7 @@ class StatsPanel(avg.DivNode):
             speed = user.getDistTravelled(start_time, end_time)/time_diff      # meters/min
             dist_travelled.append(speed)
             dist_from_wall.append(user.getAvgDistFromWall(start_time, end_time))
-            touch_freq = len(user.getTouches(start_time, end_time))/time_diff  # touches/min
+            touch_freq = user.countTouches(start_time, end_time)/time_diff  # touches/min
             num_touches.append(touch_freq)
         return dist_travelled, dist_from_wall, num_touches
 
@@ -113,10 +115,28 @@ class ParallelCoordPlotNode(avg.DivNode):
 
         self.__line_container = avg.DivNode(pos=(0,self.MARGIN[1]*3), size=(self.width, self.height-self.MARGIN[1]*5),
                 crop=True, parent=self)
-        self.__axis_nodes = []
-        self.__attrib_nodes = []
         self.__is_obj_visible = [True] * 4
 
+        # The nodes are created once; update() only changes their attributes.
+        width_per_attr = (self.width - self.MARGIN[0] * 2) / (len(self.__attribs) - 1)
+        self.__axis_x_pos = [i*width_per_attr + self.MARGIN[0] for i in range(len(self.__attribs))]
+        self.__max_label_nodes = []
+        self.__min_label_nodes = []
+        for i, attrib in enumerate(self.__attribs):
+            axis_node = avg.DivNode(pos=(self.__axis_x_pos[i], 0), parent=self)
+            avg.LineNode(pos1=(0,self.MARGIN[1]*3), pos2=(0,self.height-self.MARGIN[1]*2),
+                    color=global_values.COLOR_FOREGROUND, parent=axis_node)
+            avg.WordsNode(pos=(0, 0), alignment="center", fontsize=global_values.FONT_SIZE, text=attrib.name,
+                    linespacing=-4, parent=axis_node)
+            self.__max_label_nodes.append(avg.WordsNode(pos=(0,self.MARGIN[1]*2), alignment="center",
+                    fontsize=global_values.FONT_SIZE, parent=axis_node))
+            self.__min_label_nodes.append(avg.WordsNode(pos=(0,self.height-self.MARGIN[1]*2), alignment="center",
+                    fontsize=global_values.FONT_SIZE, parent=axis_node))
+
+        self.__polyline_nodes = []
+        for color in self.__obj_colors:
+            self.__polyline_nodes.append(avg.PolyLineNode(color=color, parent=self.__line_container))
+
     def set_attr_vals(self, i, vals):
         assert(self.__num_objs == len(vals))
         self.__attribs[i].vals = vals
@@ -131,44 +151,29 @@ class ParallelCoordPlotNode(avg.DivNode):
         self.__is_obj_visible = is_obj_visible
 
     def update(self):
-        helper.unlink_node_list(self.__axis_nodes)
-        self.__axis_nodes = []
-        helper.unlink_node_list(self.__attrib_nodes)
-        self.__attrib_nodes = []
-
-        width_per_attr = (self.width - self.MARGIN[0] * 2) / (len(self.__attribs) - 1)
-        axis_x_pos = [i*width_per_attr + self.MARGIN[0] for i in range(len(self.__attribs))]
-
-        # axes
-        for i in range(len(self.__attribs)):
-            x_pos = axis_x_pos[i]
-            axis_node = avg.DivNode(pos=(x_pos, 0), parent=self)
-            avg.LineNode(pos1=(0,self.MARGIN[1]*3), pos2=(0,self.height-self.MARGIN[1]*2),
-                    color=global_values.COLOR_FOREGROUND, parent=axis_node)
-
-            attrib = self.__attribs[i]
-            avg.WordsNode(pos=(0, 0), alignment="center", fontsize=global_values.FONT_SIZE, text=attrib.name,
-                    linespacing=-4, parent=axis_node)
-            avg.WordsNode(pos=(0,self.MARGIN[1]*2), alignment="center", fontsize=global_values.FONT_SIZE,
-                    text=self.__format_label(attrib.max, attrib.is_int), parent=axis_node)
-            avg.WordsNode(pos=(0,self.height-self.MARGIN[1]*2), alignment="center", fontsize=global_values.FONT_SIZE,
-                    text=self.__format_label(attrib.min, attrib.is_int), parent=axis_node)
-            self.__axis_nodes.append(axis_node)
+        # Axis labels. Setting the text of a WordsNode causes a relayout, so only changed labels are set.
+        for i, attrib in enumerate(self.__attribs):
+            self.__set_text(self.__max_label_nodes[i], self.__format_label(attrib.max, attrib.is_int))
+            self.__set_text(self.__min_label_nodes[i], self.__format_label(attrib.min, attrib.is_int))
 
         axis_height = self.height - self.MARGIN[1]*5
 
         # Value polylines
-        for i in range(self.__num_objs):
-            color = self.__obj_colors[i]
+        for i, polyline in enumerate(self.__polyline_nodes):
+            polyline.active = self.__is_obj_visible[i]
+            if not polyline.active:
+                continue
             posns = []
             for j, attrib in enumerate(self.__attribs):
                 val = float(attrib.vals[i])
                 rel_y_pos = (val-attrib.min) / (attrib.max-attrib.min)
                 y_pos = axis_height - rel_y_pos * axis_height
-                posns.append((axis_x_pos[j], y_pos))
-            polyline = avg.PolyLineNode(pos=posns, color=color, parent=self.__line_container)
-            polyline.active = self.__is_obj_visible[i]
-            self.__attrib_nodes.append(polyline)
+                posns.append((self.__axis_x_pos[j], y_pos))
+            polyline.pos = posns
+
+    def __set_text(self, words_node, text):
+        if words_node.text != text:
+            words_node.text = text
 
     def __format_label(self, val, is_int):
         if is_int:
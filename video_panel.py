@@ -18,6 +18,7 @@
 import libavg
 from libavg import avg, player
 import global_values
+import helper
 
 LEFT_MARGIN = 60
 
@@ -50,10 +51,11 @@ class VideoPanel(avg.DivNode):
         self.videoNode.play()
         self.videoNode.pause()
 
-        vis_params.subscribe(vis_params.CHANGED, self.update_time)
+        vis_params.subscribe(vis_params.HIGHLIGHT_TIME_CHANGED, self.update_time)
         vis_params.subscribe(vis_params.IS_PLAYING, self.__play_pause)
         player.subscribe(player.ON_FRAME, self.__time_changed)
 
+    @helper.profiled
     def update_time(self, vis_params):
         if not self.is_playing:
             self.videoNode.seekToTime(int((vis_params.highlight_time + self.__time_offset)*1000))
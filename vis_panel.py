@@ -50,7 +50,7 @@ class VisPanel(avg.DivNode):
         avg.WordsNode(pos=(10, 8), color=global_values.COLOR_FOREGROUND, text=label, sensitive=False,
                 fontsize=global_values.FONT_SIZE, parent=self._data_div)
 
-        vis_params.subscribe(vis_params.CHANGED, self._update_time)
+        vis_params.subscribe(vis_params.TIME_INTERVAL_CHANGED, self._update_time)
         self._vis_params = vis_params
 
         self.__show_grid = show_grid
@@ -79,28 +79,26 @@ class VisPanel(avg.DivNode):
 
     def _update_grid(self):
         # Horizontal
-        helper.unlink_node_list(self._x_grid)
-        self._x_grid = []
-
         if self._x_axis:
-            tick_posns = self._x_axis.get_tick_posns()
             y_max = self._data_div.height
-            for x in tick_posns:
-                node = avg.LineNode(pos1=(x, 0), pos2=(x, y_max), color=global_values.COLOR_BACKGROUND,
-                        parent=self._grid_div)
-                self._x_grid.append(node)
+            self.__update_grid_lines(self._x_grid, [((x, 0), (x, y_max)) for x in self._x_axis.get_tick_posns()])
 
         # Vertical
-        helper.unlink_node_list(self._y_grid)
-        self._y_grid = []
-
         if self._y_axis:
-            tick_posns = self._y_axis.get_tick_posns()
             x_max = self._data_div.width
-            for y in tick_posns:
-                node = avg.LineNode(pos1=(0, y), pos2=(x_max, y), color=global_values.COLOR_BACKGROUND,
-                    parent=self._grid_div)
-                self._y_grid.append(node)
+            self.__update_grid_lines(self._y_grid, [((0, y), (x_max, y)) for y in self._y_axis.get_tick_posns()])
+
+    def __update_grid_lines(self, nodes, line_posns):
+        """
+        Moves the grid line nodes to line_posns, creating nodes only if there are more lines than before.
+        Unused nodes are deactivated.
+        """
+        while len(nodes) < len(line_posns):
+            nodes.append(avg.LineNode(color=global_values.COLOR_BACKGROUND, parent=self._grid_div))
+        for i, node in enumerate(nodes):
+            node.active = i < len(line_posns)
+            if node.active:
+                node.pos1, node.pos2 = line_posns[i]
 
 
 class AxisNode(avg.DivNode):
@@ -177,31 +175,34 @@ class AxisNode(avg.DivNode):
         """
         draw each tick and the corresponding tick label on the position at the axis line
         """
-        helper.unlink_node_list(self.__ticks)
-        self.__ticks = [None] * len(self.__label_pos)
-
-        # delete old axis labels
-        helper.unlink_node_list(self.__label_nodes)
-        self.__label_nodes = [None] * len(self.__label_pos)
-
-        # for each tick create new tick-line, value label and grid line at position on axis line
-        for i, pos in enumerate(self.__label_pos):
-            # create new axis tick, label and grid line
-            tick = libavg.LineNode(strokewidth=1, color=global_values.COLOR_FOREGROUND, parent=self)
-            self.__ticks[i] = tick
-            self.__label_nodes[i] = libavg.WordsNode(color=global_values.COLOR_FOREGROUND,
-                    fontsize=global_values.FONT_SIZE, parent=self)
-
-            # set label value
+        # The tick and label nodes are reused between updates. New nodes are only created if there are more ticks
+        # than before; unused ones are deactivated.
+        while len(self.__ticks) < len(self.__label_pos):
+            self.__ticks.append(libavg.LineNode(strokewidth=1, color=global_values.COLOR_FOREGROUND, parent=self))
+            label = libavg.WordsNode(color=global_values.COLOR_FOREGROUND, fontsize=global_values.FONT_SIZE,
+                    parent=self)
+            if self.__vertical:
+                label.alignment = "right"
+            else:
+                label.alignment = "center"
+            self.__label_nodes.append(label)
+
+        for i, (tick, label) in enumerate(zip(self.__ticks, self.__label_nodes)):
+            tick.active = label.active = i < len(self.__label_pos)
+            if not tick.active:
+                continue
+            pos = self.__label_pos[i]
+
+            # set label value; changing the text causes a relayout, so only do it if the text differs.
             if not self.__top_axis:
-                self.__label_nodes[i].text = self.__format_label(self.__tick_positions[i])
-            label = self.__label_nodes[i]
+                text = self.__format_label(self.__tick_positions[i])
+                if label.text != text:
+                    label.text = text
 
             if self.__vertical:
                 v_center = label.fontsize / 2
                 tick.pos1 = (self.width, pos)
                 tick.pos2 = (self.width + self.TICK_LENGTH, pos)
-                label.alignment = "right"
                 label.pos = (self.width - self.TICK_LENGTH - self.__label_offset, pos - v_center - 1)
             else:
                 tick.pos2 = (pos, 0)
@@ -210,13 +211,9 @@ class AxisNode(avg.DivNode):
                 else:
                     tick.pos1 = (pos, - self.TICK_LENGTH)
                 label.pos = (pos, self.TICK_LENGTH/2 + self.__label_offset)
-                label.alignment = "center"
 
     def get_tick_posns(self):
-        if self.__vertical:
-            return [tick.pos1.y for tick in self.__ticks]
-        else:
-            return [tick.pos1.x for tick in self.__ticks]
+        return list(self.__label_pos)
 
     def value_to_pixel(self, value, start=None, end=None):
         if start is None:
@@ -263,6 +260,12 @@ class AxisNode(avg.DivNode):
         assert False
 
 
+# Results of r_pretty by arguments. The axes are often updated with the same ranges (e.g. while playing back or
+# when switching back and forth between intervals).
+_r_pretty_cache = {}
+R_PRETTY_CACHE_SIZE = 1000
+
+
 def r_pretty(dmin, dmax, n, time=False):
     """
     Calculates "nice" ticks for axis (R's pretty algorithm).
@@ -272,6 +275,18 @@ def r_pretty(dmin, dmax, n, time=False):
     :param time: bool, True: handles tick calculation different for time values
     :return: list with tick values
     """
+    key = (dmin, dmax, n, time)
+    ticks = _r_pretty_cache.get(key)
+    if ticks is None:
+        ticks = _calc_r_pretty(dmin, dmax, n, time)
+        if len(_r_pretty_cache) >= R_PRETTY_CACHE_SIZE:
+            _r_pretty_cache.clear()
+        _r_pretty_cache[key] = ticks
+    # Callers may modify the list.
+    return list(ticks)
+
+
+def _calc_r_pretty(dmin, dmax, n, time):
     min_n = int(n / 3)                          # non-negative integer giving minimal number of intervals n
     shrink_small = 0.75                         # positive numeric by which a default scale is shrunk
     high_unit_bias = 1.5                        # non-negative numeric, typically > 1
@@ -15,25 +15,45 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-from libavg import avg
+from libavg import avg, player
+
+import helper
 
 
 class VisParams(avg.Publisher):
+    # Sent for the parameters that changed since the last notification. CHANGED is sent after the specific
+    # messages if anything changed.
+    TIME_INTERVAL_CHANGED = avg.Publisher.genMessageID()
+    HIGHLIGHT_TIME_CHANGED = avg.Publisher.genMessageID()
+    USER_VISIBILITY_CHANGED = avg.Publisher.genMessageID()
+    SMOOTHNESS_CHANGED = avg.Publisher.genMessageID()
     CHANGED = avg.Publisher.genMessageID()
     IS_PLAYING = avg.Publisher.genMessageID()
 
+    CHANGE_MESSAGES = (TIME_INTERVAL_CHANGED, HIGHLIGHT_TIME_CHANGED, USER_VISIBILITY_CHANGED, SMOOTHNESS_CHANGED)
+
     MIN_SMOOTHNESS_FACTOR = 0.01
     MAX_SMOOTHNESS_FACTOR = 1.
 
     __highlight_time = 0
     __zoom_strength = 0.15
 
-    def __init__(self, session):
+    def __init__(self, session, deferred=True):
+        """
+        :param deferred: If True, notify() only marks the changes and the messages are sent once per frame, so
+            several changes in one frame cause only one update of each panel.
+        """
         super(VisParams, self).__init__()
         self.__is_playing = False
         self.__time_interval = [0, session.duration]
+        self.__changes = set()
+        for msg in self.CHANGE_MESSAGES:
+            self.publish(msg)
         self.publish(VisParams.CHANGED)
         self.publish(VisParams.IS_PLAYING)
+        self.__is_deferred = deferred
+        if deferred:
+            player.subscribe(player.ON_FRAME, self.__send_changes)
 
         self.__smoothness_factor = self.MAX_SMOOTHNESS_FACTOR/2.
         self.__users_visible = [True]*session.num_users
@@ -49,6 +69,7 @@ class VisParams(avg.Publisher):
         point = self.__time_interval[0] + fraction_in_timeframe * (self.__time_interval[1] - self.__time_interval[0])
         self.__time_interval[0] = point - (point - self.__time_interval[0]) * (1 - self.__zoom_strength)
         self.__time_interval[1] = point + (self.__time_interval[1] - point) * (1 - self.__zoom_strength)
+        self.__changes.add(VisParams.TIME_INTERVAL_CHANGED)
         self.notify()
 
     def zoom_out_at(self, fraction_in_timeframe):
@@ -64,6 +85,7 @@ class VisParams(avg.Publisher):
 
         if self.__time_interval[1] > time_range[1]:
             self.__time_interval[1] = time_range[1]
+        self.__changes.add(VisParams.TIME_INTERVAL_CHANGED)
         self.notify()
 
     def shift_time(self, forwards, amount=-1):
@@ -79,27 +101,45 @@ class VisParams(avg.Publisher):
         if self.__time_interval[1] + shift_amount > self.__duration:
             shift_amount = self.__duration - self.__time_interval[1]
 
-        self.__time_interval[0] += shift_amount
-        self.__time_interval[1] += shift_amount
-        self.__highlight_time += shift_amount
-        self.notify()
+        if shift_amount != 0:
+            self.__time_interval[0] += shift_amount
+            self.__time_interval[1] += shift_amount
+            self.highlight_time += shift_amount
+            self.__changes.add(VisParams.TIME_INTERVAL_CHANGED)
+            self.notify()
 
     def set_time_interval(self, interval):
-        self.__time_interval = list(interval)
+        if list(interval) != self.__time_interval:
+            self.__time_interval = list(interval)
+            self.__changes.add(VisParams.TIME_INTERVAL_CHANGED)
         self.notify()
 
     def notify(self):
-        self.notifySubscribers(VisParams.CHANGED, [self])
+        """
+        Sends the change messages for all parameters that changed since the last notification. In deferred mode,
+        the messages are sent at the next frame.
+        """
+        if not self.__is_deferred:
+            self.__send_changes()
+
+    def notify_all(self):
+        """
+        Sends all change messages, e.g. to initialize newly created panels.
+        """
+        self.__changes.update(self.CHANGE_MESSAGES)
+        self.notify()
 
     def get_user_visible(self, i):
         return self.__users_visible[i]
 
     def set_user_visible(self, i, visible):
         self.__users_visible[i] = visible
+        self.__changes.add(VisParams.USER_VISIBILITY_CHANGED)
         self.notify()
 
     def set_smoothness_factor(self, value):
         self.__smoothness_factor = value
+        self.__changes.add(VisParams.SMOOTHNESS_CHANGED)
 
     def get_smoothness_factor(self):
         return self.__smoothness_factor
@@ -119,8 +159,19 @@ class VisParams(avg.Publisher):
             h = user_hues[userid]
         return avg.Color.fromLch(l, c, h)
 
+    def __send_changes(self):
+        changes = self.__changes
+        self.__changes = set()
+        if changes:
+            for msg in self.CHANGE_MESSAGES:
+                if msg in changes:
+                    self.notifySubscribers(msg, [self])
+            self.notifySubscribers(VisParams.CHANGED, [self])
+            helper.update_profiler.end_frame()
+
     def __set_highlight_time(self, time):
         self.__highlight_time = time
+        self.__changes.add(VisParams.HIGHLIGHT_TIME_CHANGED)
 
     def __get_highlight_time(self):
         return self.__highlight_time
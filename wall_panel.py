@@ -17,6 +17,7 @@
 
 import pat_model
 import global_values
+import helper
 import vis_panel
 from libavg import avg, player
 
@@ -52,13 +53,18 @@ class WallPanel(vis_panel.VisPanel):
 
         self.__plot_nodes = []
         self.__heatmap_nodes = []
+        # Touch positions of each user and the index range currently shown in its scatter plot.
+        self.__touch_posns = []
+        self.__shown_touch_ranges = []
+        self.__heatmap_range = ((pat_model.x_wall_range[0], pat_model.y_wall_range[0]),
+                (pat_model.x_wall_range[1], pat_model.y_wall_range[1]))
+        self.__heatmap_size = (50,25)
         for user in self.__users:
             color = str(vis_params.get_user_color(user.getUserID()))
 
             node = heatmap.HeatMapNode(size=self.__plot_div.size,
-                    viewportrangemin=(pat_model.x_wall_range[0], pat_model.y_wall_range[0]),
-                    viewportrangemax=(pat_model.x_wall_range[1], pat_model.y_wall_range[1]),
-                    mapsize=(50,25), valuerangemin=0, valuerangemax=8,
+                    viewportrangemin=self.__heatmap_range[0], viewportrangemax=self.__heatmap_range[1],
+                    mapsize=self.__heatmap_size, valuerangemin=0, valuerangemax=8,
                     colormap=(color, color), opacitymap=(0,1), blendmode="add", parent=self.__plot_div)
             node.setEffect(avg.BlurFXNode(radius=1))
             self.__heatmap_nodes.append(node)
@@ -66,15 +72,16 @@ class WallPanel(vis_panel.VisPanel):
             node = plots.ScatterPlotNode(size=self.__plot_div.size, viewportrangemax=pat_model.touch_range,
                     color=color, parent=self.__plot_div)
             self.__plot_nodes.append(node)
+            self.__touch_posns.append(pat_model.get_touch_arrays(user, float("-inf"), float("inf"))[1])
+            self.__shown_touch_ranges.append((0, 0))
 
-        self.__time_interval = [None, None]
+        vis_params.subscribe(vis_params.USER_VISIBILITY_CHANGED, self._update_time)
 
+    @helper.profiled
     def _update_time(self, vis_params):
-        old_interval = self.__time_interval[:]
-        self.__time_interval = vis_params.get_time_interval()[:]
-        if old_interval != self.__time_interval:
-            self.__show_touches(self.__time_interval)
-            self.__show_viewpoints(self.__time_interval)
+        time_interval = vis_params.get_time_interval()
+        self.__show_touches(time_interval)
+        self.__show_viewpoints(time_interval)
 
     def __create_display_borders(self):
         parent = self.__plot_div
@@ -89,20 +96,40 @@ class WallPanel(vis_panel.VisPanel):
                 parent=parent)
 
     def __show_touches(self, time_interval):
+        # Touches are sorted by time, so the touches in an interval are a contiguous index range. When the
+        # interval changes, only the touches that enter or leave the range are added to or removed from the plot.
         for i, user in enumerate(self.__users):
             if self._vis_params.get_user_visible(i):
-                touches = user.getTouches(time_interval[0], time_interval[1])
-                touch_posns = [touch.pos for touch in touches]
-                self.__plot_nodes[i].setPosns(touch_posns)
+                new_range = user.getTouchIndexRange(time_interval[0], time_interval[1])
             else:
-                self.__plot_nodes[i].setPosns([])
+                new_range = (0, 0)
+            old_range = self.__shown_touch_ranges[i]
+            if new_range == old_range:
+                continue
+
+            posns = self.__touch_posns[i]
+            node = self.__plot_nodes[i]
+            removed = [(old_range[0], min(old_range[1], new_range[0])), (max(new_range[1], old_range[0]), old_range[1])]
+            added = [(new_range[0], min(new_range[1], old_range[0])), (max(old_range[1], new_range[0]), new_range[1])]
+            num_changed = sum(max(0, end - start) for start, end in removed + added)
+            if num_changed >= new_range[1] - new_range[0]:
+                node.setPosnArray(posns[new_range[0]:new_range[1]])
+            else:
+                for start, end in removed:
+                    if start < end:
+                        node.removePosnArray(posns[start:end])
+                for start, end in added:
+                    if start < end:
+                        node.addPosnArray(posns[start:end])
+            self.__shown_touch_ranges[i] = new_range
 
     def __show_viewpoints(self, time_interval):
         val_max = 8 * ((time_interval[1] - time_interval[0])/60.)
         for i, user in enumerate(self.__users):
             self.__heatmap_nodes[i].valuerangemax = val_max
             if self._vis_params.get_user_visible(i):
-                viewpoints = user.getHeadViewpoints(time_interval[0], time_interval[1])
-                self.__heatmap_nodes[i].setPosns(viewpoints)
+                counts = pat_model.get_head_viewpoint_heat_map(user, time_interval[0], time_interval[1],
+                        self.__heatmap_range[0], self.__heatmap_range[1], self.__heatmap_size)
+                self.__heatmap_nodes[i].setMatrix(counts.tolist())
             else:
                 self.__heatmap_nodes[i].setPosns([])